@@ -1,11 +1,16 @@
-from google import genai
-from utils import load_json
-import base64
-import io
-from PIL import Image
+from utils import load_json, log
+from context_builder import build_contents
+from conversation_summary import RollingSummary
+import conversation_summary
+import settings
+import latency_trace
+import blob_store
 
 
 import os
+import time
+import asyncio
+import threading
 
 DEFAULT_SYSTEM_PROMPT = (
     "explain easily with metaphors or examples, "
@@ -25,51 +30,247 @@ else:
 
 
 
-class GeminiClient:
+# 연결 유지 (첫 질문의 DNS / TLS 핸드셰이크 비용 제거)
+#   keepalive_seconds : 쉬는 연결을 풀에 남겨 두는 시간 (기본 120, httpx 기본값은 5초)
+DEFAULT_KEEPALIVE_SECONDS = 120
+WARM_RETRY_SECONDS = 10     # warm 이 실패 / 진행 중이면 입력 중 재시도 간격
+
+
+def _http_options(keepalive, base_url=None):
+    extra = {"base_url": base_url} if base_url else {}
+    try:
+        import httpx
+        from google.genai import types
+
+        limits = httpx.Limits(max_keepalive_connections=4, keepalive_expiry=keepalive)
+        return types.HttpOptions(
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+            **extra
+        )
+    except Exception as e:
+        log(f"[Gemini_client] keep-alive options unavailable: {e}")
+        return extra or None
+
+
+
+class _Connection:
+    """genai.Client 와 연결 상태 (세션끼리 공유)"""
 
-    def __init__(self):
-        keydata = load_json("storage/api_key.json")
-        if not keydata or "api_key" not in keydata:
-            raise Exception("API Key not found.")
+    def __init__(self, api_key, base_url):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.client = None
+        self.error = None
+        self.ready = threading.Event()
+        self.warming = threading.Lock()
+        self.last_activity = 0.0
+        self.last_warm_attempt = 0.0
 
-        self.client = genai.Client(api_key=keydata["api_key"])
+
+
+class GeminiClient:
+
+    def __init__(self, connect=True, api_key=None, base_url=None, shared=None, summary_path=None):
+        """
+        api_key / base_url : 벤치마크 등에서 로컬 가짜 서버로 보낼 때
+                             (없으면 storage/api_key.json, 실제 API 주소)
+        shared             : 연결을 같이 쓸 GeminiClient (new_session 참고)
+        summary_path       : 대화 요약 저장 위치 (세션마다 따로)
+        """
+        self.model = "gemini-2.5-flash"
 
         self.history = []
         self.max_history = 10
 
+        # max_history 를 넘은 대화는 버리지 않고 요약으로 접음
+        self.summary = RollingSummary(summary_path or conversation_summary.SUMMARY_PATH)
 
-    def send_message(self, text="", image_b64=None, on_delta=None):
+        # genai.Client 생성 + 첫 연결은 백그라운드에서 (창은 바로 뜬다)
+        if shared is not None:
+            self._conn = shared._conn
+            return
 
-        # 히스토리 저장
-        self.history.append({"text": text, "image_b64": image_b64})
-        if len(self.history) > self.max_history:
-            self.history = self.history[-self.max_history:]
+        if api_key is None:
+            keydata = load_json("storage/api_key.json")
+            if not keydata or "api_key" not in keydata:
+                raise Exception("API Key not found.")
+            api_key = keydata["api_key"]
 
+        self._conn = _Connection(api_key, base_url)
 
-        # ============================
-        # contents 구성
-        # ============================
-        contents = []
-        contents.append(SYSTEM_PROMPT)
+        if connect:
+            self.connect_in_background()
+
+
+    def new_session(self, summary_path):
+        """같은 연결(풀 / warm 상태)을 쓰고 대화 기록과 요약만 따로 가지는 클라이언트"""
+        return GeminiClient(shared=self, summary_path=summary_path)
+
+
+    # ============================
+    # 연결 (백그라운드 생성 / 미리 연결)
+    # ============================
+    def keepalive_seconds(self):
+        return float(settings.get("keepalive_seconds", DEFAULT_KEEPALIVE_SECONDS))
+
+
+    def connect_in_background(self):
+        threading.Thread(target=self._connect, name="GeminiConnect", daemon=True).start()
+
+
+    def _connect(self):
+        try:
+            # SDK import 가 무거우므로 (수백 ms) 창이 뜬 뒤 이 스레드에서
+            from google import genai
+
+            conn = self._conn
+            options = _http_options(self.keepalive_seconds(), conn.base_url)
+            try:
+                conn.client = genai.Client(api_key=conn.api_key, http_options=options)
+            except Exception as e:
+                # client_args 를 모르는 구버전 SDK
+                log(f"[Gemini_client] falling back to default client: {e}")
+                fallback = {"base_url": conn.base_url} if conn.base_url else None
+                conn.client = genai.Client(api_key=conn.api_key, http_options=fallback)
+        except Exception as e:
+            self._conn.error = e
+            self._conn.ready.set()
+            return
+
+        self._conn.ready.set()
+        self.warm()
+
+
+    @property
+    def client(self):
+        """생성이 끝날 때까지 기다렸다 반환 (보통 첫 질문 전에 이미 끝나 있음)"""
+        self._conn.ready.wait()
+        if self._conn.error is not None:
+            raise self._conn.error
+        return self._conn.client
+
+
+    def warm(self):
+        """
+        가벼운 요청(모델 정보 조회)으로 연결을 미리 열어 둔다.
+        generate 요청이 아니므로 무료 한도를 쓰지 않는다.
+        async_requests 면 실제로 쓸 aio 풀을 AsyncRequestWorker 의 루프에서 연다.
+        """
+        if not self._conn.warming.acquire(blocking=False):
+            return
+
+        self._conn.last_warm_attempt = time.monotonic()
+        try:
+            t0 = time.perf_counter()
+            if settings.get("async_requests", False):
+                from request_worker import shared_loop
+                asyncio.run_coroutine_threadsafe(
+                    self.client.aio.models.get(model=self.model), shared_loop()
+                ).result()
+            else:
+                self.client.models.get(model=self.model)
+            self._touch()
+            log(f"[Gemini_client] warm {(time.perf_counter() - t0) * 1000:.0f} ms")
+        except Exception as e:
+            log(f"[Gemini_client] warm ERROR: {e}")
+        finally:
+            self._conn.warming.release()
+
+
+    def warm_if_idle(self):
+        """
+        입력 중에 호출. 풀의 연결이 이미 닫혔을 만큼 오래 쉬었으면
+        보내기 전에 백그라운드에서 다시 연결한다.
+        """
+        conn = self._conn
+        if not conn.ready.is_set() or conn.error is not None or conn.warming.locked():
+            return
+
+        now = time.monotonic()
+        if now - conn.last_activity < self.keepalive_seconds() * 0.8:
+            return
+        # 실패한 뒤에는 키 입력마다가 아니라 잠시 쉬었다가 다시
+        if now - conn.last_warm_attempt < WARM_RETRY_SECONDS:
+            return
 
-        for item in self.history:
+        conn.last_warm_attempt = now
+        threading.Thread(target=self.warm, name="GeminiWarm", daemon=True).start()
 
-            # 텍스트
-            if item["text"]:
-                contents.append(item["text"])
 
-            # 이미지 (★ 유일하게 허용되는 형식: PIL.Image)
-            if item["image_b64"]:
-                img_bytes = base64.b64decode(item["image_b64"])
-                pil_img = Image.open(io.BytesIO(img_bytes))
-                contents.append(pil_img)
+    def _touch(self):
+        self._conn.last_activity = time.monotonic()
+
+
+    def record_exchange(self, text, image_hash, reply):
+        """네트워크 없이 얻은 답(캐시 등)도 대화 맥락에 남긴다"""
+        self.history = self._trim(self.history + [
+            {"role": "user", "text": text, "image_hash": image_hash},
+            {"role": "model", "text": reply, "image_hash": None},
+        ])
+
+
+    def image_hashes(self):
+        """지금 대화 기록(max_history 창)에 남아 있는 이미지 해시 (요약으로 접힌 것은 제외)"""
+        return {h for item in self.history for h in blob_store.split_hashes(item.get("image_hash"))}
+
+
+    def _prepare(self, text, image_hash):
+        # 히스토리 (이미지는 blob 해시만)
+        # 요청이 실패하면 그대로 버려지도록, 성공한 뒤에 self.history 에 반영
+        history = self.history + [{"role": "user", "text": text, "image_hash": image_hash}]
+
+        # contents 구성 (요약 + 이미지 보존 정책 + 토큰 예산)
+        # 보내기 전 예상 크기 (이미지 수 / 토큰 / 바이트) 는 trace 에 같이 남김
+        contents, stats = build_contents(*self._context(history))
+        latency_trace.note("request", stats)
+        latency_trace.mark("request_built")
+        return history, contents
+
+
+    def _context(self, history):
+        """build_contents 인자: 요약 사용 시 (요약, 아직 요약 안 된 항목 + 최근 대화)"""
+        if not conversation_summary.enabled():
+            return SYSTEM_PROMPT, history[-self.max_history:]
+        return SYSTEM_PROMPT, self.summary.pending() + history, None, self.summary.text
+
+
+    def _commit(self, history, full_text):
+        history.append({"role": "model", "text": full_text, "image_hash": None})
+        self.history = self._trim(history)
+
+
+    def _trim(self, history):
+        if len(history) <= self.max_history:
+            return history
+        if not conversation_summary.enabled():
+            return history[-self.max_history:]
+
+        # 몇 문답씩 모아서 한 번에 요약 (요약 요청 횟수 절약)
+        keep = max(2, self.max_history - conversation_summary.FOLD_BATCH)
+        self.summary.fold(history[:-keep], self._summarize)
+        return history[-keep:]
+
+
+    def _summarize(self, previous, items):
+        """요약 스레드에서 호출"""
+        response = self.client.models.generate_content(
+            model=conversation_summary.summary_model(),
+            contents=conversation_summary.build_prompt(previous, items)
+        )
+        return (response.text or "").strip()
+
+
+    def send_message(self, text="", image_hash=None, on_delta=None, cancel_event=None):
+
+        history, contents = self._prepare(text, image_hash)
 
 
         # ============================
         # 스트리밍 호출
         # ============================
         response = self.client.models.generate_content_stream(
-            model="gemini-2.5-flash",
+            model=self.model,
             contents=contents
         )
 
@@ -79,15 +280,55 @@ class GeminiClient:
         full_text = ""
 
         for chunk in response:
+            # 취소 요청 시 스트림 중단 (받은 부분까지만 히스토리에 남김)
+            if cancel_event is not None and cancel_event.is_set():
+                close = getattr(response, "close", None)
+                if close:
+                    close()
+                break
+
             if chunk.text:
                 full_text += chunk.text
                 if on_delta:
                     on_delta(chunk.text)
 
         # 히스토리에 추가
-        self.history.append({"text": full_text, "image_b64": None})
-
-        if len(self.history) > self.max_history:
-            self.history = self.history[-self.max_history:]
+        self._commit(history, full_text)
+        self._touch()
 
         return full_text
+
+
+    async def stream(self, text="", image_hash=None):
+        """
+        비동기 스트리밍:
+            async for delta in client.stream(text, image_hash): ...
+        task 를 cancel 하면 받은 부분까지만 히스토리에 남긴다.
+        """
+
+        history, contents = self._prepare(text, image_hash)
+
+        # 백그라운드 생성이 아직 안 끝났으면 루프를 막지 않고 기다림
+        if not self._conn.ready.is_set():
+            await asyncio.to_thread(self._conn.ready.wait)
+
+        response = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=contents
+        )
+
+        # 요청은 첫 async for 에서 실제로 나가므로 429 / 네트워크 오류도 이 안에서 난다.
+        # 동기 경로와 같이 정상 종료 또는 취소 때만 히스토리에 반영 (오류면 재시도가 다시 보냄)
+        full_text = ""
+        try:
+            async for chunk in response:
+                if chunk.text:
+                    full_text += chunk.text
+                    yield chunk.text
+        except (asyncio.CancelledError, GeneratorExit):
+            self._commit(history, full_text)
+            self._touch()
+            raise
+
+        self._commit(history, full_text)
+        self._touch()
@@ -0,0 +1,362 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import shutil
+import argparse
+import tempfile
+
+# 디스플레이 없는 리눅스에서도 Qt 모듈을 import 할 수 있게
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+# ----------------------------------------------------------
+# 오프라인 벤치마크 (API 키 / 네트워크 / GPU 불필요)
+# ----------------------------------------------------------
+#   python benchmark.py                       전체 실행
+#   python benchmark.py --only encode,client  일부만
+#   python benchmark.py --quick               반복 횟수 줄여서
+#   python benchmark.py --json after.json --baseline before.json
+#                                             결과 저장 + 이전 결과와 비교
+#
+# encode  : 합성 스크린샷(해상도별) → base64 왕복, 보관 PNG, 업로드 JPEG,
+#           캡처 1장 전체 처리(prepare_capture), 변화 감지
+# history : SQLite 대화 기록 INSERT / 페이지 로드
+# client  : 로컬 가짜 서버(fake_gemini.py)로 GeminiClient 스트리밍
+#           첫 토큰 시간, 전체 시간, 초당 토큰 (동기 / async)
+# capture : 실제 화면 캡처 백엔드 (디스플레이가 있을 때만)
+
+RESOLUTIONS = [(1280, 720), (1920, 1080), (2560, 1440), (3840, 2160)]
+
+
+def synthetic_screenshot(width, height, seed=0):
+    """창 / 글자 줄 / 아이콘이 있는 화면 비슷한 이미지 (압축률도 실제와 비슷하게)"""
+    from PIL import Image, ImageDraw
+
+    rnd = random.Random(seed)
+    img = Image.new("RGB", (width, height), (32, 36, 44))
+    draw = ImageDraw.Draw(img)
+
+    # 작업 표시줄
+    draw.rectangle((0, height - 48, width, height), fill=(20, 20, 24))
+
+    for _ in range(6):
+        w = rnd.randint(width // 4, width // 2)
+        h = rnd.randint(height // 4, height // 2)
+        x = rnd.randint(0, width - w)
+        y = rnd.randint(0, height - 48 - h)
+        draw.rectangle((x, y, x + w, y + h), fill=(245, 245, 245), outline=(90, 90, 90))
+        draw.rectangle((x, y, x + w, y + 28), fill=(rnd.randint(40, 200), 90, 160))
+
+        for line_y in range(y + 40, y + h - 16, 18):
+            words = []
+            for _ in range(rnd.randint(3, max(4, w // 60))):
+                words.append("".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(2, 9))))
+            draw.text((x + 12, line_y), " ".join(words), fill=(30, 30, 30))
+
+        for _ in range(4):
+            ix = rnd.randint(x, x + w - 32)
+            iy = rnd.randint(y + 30, y + h - 32)
+            draw.ellipse((ix, iy, ix + 24, iy + 24), fill=(rnd.randint(0, 255), rnd.randint(0, 255), 80))
+
+    return img
+
+
+def _timed_ms(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def summarize(samples):
+    from latency_trace import percentile
+    return {
+        "p50": round(percentile(samples, 50), 2),
+        "p95": round(percentile(samples, 95), 2),
+        "mean": round(sum(samples) / len(samples), 2),
+    }
+
+
+# ----------------------------------------------------------
+# encode / capture 처리
+# ----------------------------------------------------------
+def bench_encode(rounds):
+    import utils
+    import payload_cache
+    import encode_pipeline
+    from change_detect import ChangeDetector
+
+    results = {}
+    for width, height in RESOLUTIONS:
+        name = f"{width}x{height}"
+        img = synthetic_screenshot(width, height)
+        img.load()
+        megapixels = width * height / 1e6
+        r = {}
+
+        b64 = utils.image_to_base64(img)
+        r["base64_encode_ms"] = summarize(_timed_ms(lambda: utils.image_to_base64(img), rounds))
+        r["base64_decode_ms"] = summarize(_timed_ms(lambda: utils.base64_to_image(b64), rounds))
+
+        png = encode_pipeline.encode_image(img, "PNG")
+        r["png_ms"] = summarize(_timed_ms(lambda: encode_pipeline.encode_image(img, "PNG"), rounds))
+        r["png_kb"] = round(len(png) / 1024, 1)
+
+        options = payload_cache.current_options()
+        payload = payload_cache.encode_payload(img, *options)
+        r["upload_ms"] = summarize(_timed_ms(lambda: payload_cache.encode_payload(img, *options), rounds))
+        r["upload_kb"] = round(len(payload) / 1024, 1)
+
+        # 캡처 1장 전체 처리 (매번 새 화면 취급)
+        def prepare_full():
+            encode_pipeline.prepare_capture(img, "", "full", ChangeDetector(), 180)
+        r["prepare_full_ms"] = summarize(_timed_ms(prepare_full, rounds))
+        r["prepare_mpix_per_s"] = round(megapixels / (r["prepare_full_ms"]["p50"] / 1000), 1)
+
+        # 같은 화면 다시 캡처 → 변화 감지만
+        detector = ChangeDetector()
+        prepared = encode_pipeline.prepare_capture(img, "", "full", detector, 180)
+        detector.commit(prepared.change, prepared.display_hash)
+        r["prepare_same_ms"] = summarize(_timed_ms(
+            lambda: encode_pipeline.prepare_capture(img, "", "full", detector, 180), rounds
+        ))
+
+        results[name] = r
+        print(f"  {name:>10}  png {r['png_ms']['p50']:7.1f} ms ({r['png_kb']:.0f} KB)  "
+              f"upload {r['upload_ms']['p50']:6.1f} ms ({r['upload_kb']:.0f} KB)  "
+              f"prepare {r['prepare_full_ms']['p50']:7.1f} ms  same {r['prepare_same_ms']['p50']:5.1f} ms  "
+              f"b64 {r['base64_encode_ms']['p50']:6.1f}/{r['base64_decode_ms']['p50']:.1f} ms")
+
+    return results
+
+
+# ----------------------------------------------------------
+# 대화 기록 저장소
+# ----------------------------------------------------------
+def bench_history(rows):
+    from history_store import HistoryStore
+
+    store = HistoryStore(path="storage/bench_history.db", legacy_json_path=None)
+
+    t0 = time.perf_counter()
+    for i in range(rows):
+        store.append("user" if i % 2 == 0 else "assistant",
+                     f"message {i} " + "lorem ipsum " * 20, None,
+                     "2025-01-01 12:00", f"2025-01-{1 + i // 500:02d}")
+    append_s = time.perf_counter() - t0
+
+    newest = _timed_ms(lambda: store.load_page(None, 40), 50)
+
+    middle_id = rows // 2
+    older = _timed_ms(lambda: store.load_page(middle_id, 40), 50)
+    store.close()
+
+    r = {
+        "append_rows_per_s": round(rows / append_s),
+        "load_newest_page_ms": summarize(newest),
+        "load_older_page_ms": summarize(older),
+    }
+    print(f"  append {r['append_rows_per_s']} rows/s  "
+          f"newest page {r['load_newest_page_ms']['p50']:.2f} ms  "
+          f"older page {r['load_older_page_ms']['p50']:.2f} ms")
+    return r
+
+
+# ----------------------------------------------------------
+# GeminiClient ↔ 가짜 서버
+# ----------------------------------------------------------
+def bench_client(requests, latency, token_rate, reply_tokens):
+    try:
+        import google.genai  # noqa: F401
+    except ImportError:
+        print("  skipped (google-genai not installed)")
+        return None
+
+    import blob_store
+    import payload_cache
+    from Gemini_client import GeminiClient
+    from fake_gemini import FakeGeminiServer
+
+    image_hash = blob_store.put_image(synthetic_screenshot(1920, 1080))
+    payload_cache.build_payload(image_hash, blob_store.open_image(image_hash))
+
+    results = {}
+    with FakeGeminiServer(latency=latency, token_rate=token_rate, reply_tokens=reply_tokens) as fake:
+        client = GeminiClient(api_key="fake", base_url=fake.url)
+        client.client   # 백그라운드 연결 완료까지 대기
+
+        for label, with_image in (("text", False), ("image", True)):
+            ttft, total = [], []
+            received_before = fake.bytes_received
+            for _ in range(requests):
+                client.history = []
+                first = []
+                t0 = time.perf_counter()
+                client.send_message(
+                    "benchmark", image_hash if with_image else None,
+                    on_delta=lambda _chunk: first or first.append(time.perf_counter())
+                )
+                t1 = time.perf_counter()
+                ttft.append((first[0] - t0) * 1000 if first else (t1 - t0) * 1000)
+                total.append((t1 - t0) * 1000)
+
+            results[f"sync_{label}"] = _client_summary(
+                ttft, total, reply_tokens, (fake.bytes_received - received_before) / requests
+            )
+
+        async def run_async():
+            ttft, total = [], []
+            for _ in range(requests):
+                client.history = []
+                first = None
+                t0 = time.perf_counter()
+                async for _delta in client.stream("benchmark", image_hash):
+                    if first is None:
+                        first = time.perf_counter()
+                t1 = time.perf_counter()
+                ttft.append(((first or t1) - t0) * 1000)
+                total.append((t1 - t0) * 1000)
+            return ttft, total
+
+        received_before = fake.bytes_received
+        ttft, total = asyncio.run(run_async())
+        results["async_image"] = _client_summary(
+            ttft, total, reply_tokens, (fake.bytes_received - received_before) / requests
+        )
+
+    results["server"] = {"latency_ms": latency * 1000, "token_rate": token_rate}
+    for label, r in results.items():
+        if label == "server":
+            continue
+        print(f"  {label:>12}  first token {r['first_token_ms']['p50']:7.1f} ms  "
+              f"total {r['total_ms']['p50']:7.1f} ms  {r['tokens_per_s']:6.1f} tok/s  "
+              f"upload {r['upload_kb']:.0f} KB")
+    return results
+
+
+def _client_summary(ttft, total, reply_tokens, upload_bytes):
+    stream_s = max(1e-6, (sorted(total)[len(total) // 2] - sorted(ttft)[len(ttft) // 2]) / 1000)
+    return {
+        "first_token_ms": summarize(ttft),
+        "total_ms": summarize(total),
+        "tokens_per_s": round(reply_tokens / stream_s, 1),
+        "upload_kb": round(upload_bytes / 1024, 1),
+    }
+
+
+# ----------------------------------------------------------
+# 실제 화면 캡처 (디스플레이가 있을 때만)
+# ----------------------------------------------------------
+def bench_capture(rounds):
+    if os.environ.get("QT_QPA_PLATFORM") == "offscreen" and sys.platform.startswith("linux") \
+            and not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY"):
+        print("  skipped (no display)")
+        return None
+
+    import capture_engine
+
+    try:
+        results = capture_engine.benchmark_backends(None, rounds)
+    except Exception as e:
+        print(f"  skipped ({e})")
+        return None
+
+    for name, r in results.items():
+        print(f"  {name:>5}  grab {r['grab_ms']:7.1f} ms")
+    return results
+
+
+# ----------------------------------------------------------
+# 결과 비교
+# ----------------------------------------------------------
+def flatten(data, prefix=""):
+    flat = {}
+    for key, value in (data or {}).items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline, current):
+    old, new = flatten(baseline), flatten(current)
+    print(f"\n{'metric':<52}{'before':>12}{'after':>12}{'change':>9}")
+    for key in sorted(new):
+        if key not in old or key.endswith(".mean") or key.startswith("meta."):
+            continue
+        before, after = old[key], new[key]
+        change = f"{(after - before) / before * 100:+.0f}%" if before else ""
+        print(f"{key:<52}{before:>12.2f}{after:>12.2f}{change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks (no API key or network needed)")
+    parser.add_argument("--only", default="encode,history,client,capture",
+                        help="comma separated: encode,history,client,capture")
+    parser.add_argument("--quick", action="store_true", help="fewer rounds")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare with an earlier --json result")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake server first-token latency (s)")
+    parser.add_argument("--token-rate", type=float, default=80.0, help="fake server tokens per second")
+    parser.add_argument("--reply-tokens", type=int, default=200)
+    args = parser.parse_args()
+
+    only = set(args.only.split(","))
+    rounds = 3 if args.quick else 10
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    # storage/ 가 실제 사용자 데이터와 섞이지 않도록 임시 폴더에서 실행
+    workdir = tempfile.mkdtemp(prefix="acg_bench_")
+    os.chdir(workdir)
+
+    results = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    }
+
+    if "encode" in only:
+        print("encode")
+        results["encode"] = bench_encode(rounds)
+    if "history" in only:
+        print("history")
+        results["history"] = bench_history(2000 if args.quick else 10000)
+    if "client" in only:
+        print("client (fake server)")
+        results["client"] = bench_client(
+            rounds, args.latency, args.token_rate, args.reply_tokens
+        )
+    if "capture" in only:
+        print("capture")
+        results["capture"] = bench_capture(rounds)
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nsaved {json_path}")
+
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        compare(baseline, results)
+
+
+if __name__ == "__main__":
+    main()
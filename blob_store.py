@@ -0,0 +1,128 @@
+import os
+import io
+import base64
+import hashlib
+import traceback
+
+from PIL import Image
+
+from utils import log
+
+
+# ----------------------------------------------------------
+# 스크린샷 저장소 (내용 주소 방식)
+# ----------------------------------------------------------
+# storage/blobs/<sha256>.png 로 한 번만 저장하고,
+# 대화 기록 / GeminiClient / 말풍선은 해시 문자열만 들고 다닌다.
+# 같은 화면을 다시 찍으면 같은 해시 → 파일은 하나만 남는다.
+
+BLOB_DIR = "storage/blobs"
+BLOB_EXT = ".png"
+
+
+def blob_path(blob_hash):
+    return os.path.join(BLOB_DIR, blob_hash + BLOB_EXT)
+
+
+def is_blob_hash(value):
+    if not isinstance(value, str) or len(value) != 64:
+        return False
+    try:
+        int(value, 16)
+        return True
+    except ValueError:
+        return False
+
+
+def join_hashes(hashes):
+    """여러 장(연속 캡처)을 대화 기록 img 칸 하나에 저장할 때: 공백으로 구분"""
+    return " ".join(h for h in hashes if h) or None
+
+
+def split_hashes(value):
+    """img 칸 값 → 해시 목록 (한 장이면 [hash])"""
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [h for h in value if h]
+    return value.split()
+
+
+def has_blob(blob_hash):
+    return bool(blob_hash) and os.path.exists(blob_path(blob_hash))
+
+
+# ----------------------------------------------------------
+# 저장
+# ----------------------------------------------------------
+def put_bytes(png_bytes):
+    blob_hash = hashlib.sha256(png_bytes).hexdigest()
+    path = blob_path(blob_hash)
+
+    if os.path.exists(path):
+        return blob_hash   # 중복 → 쓰기 생략
+
+    try:
+        os.makedirs(BLOB_DIR, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(png_bytes)
+        os.replace(tmp, path)
+    except Exception as e:
+        log(f"[blob_store] put_bytes ERROR: {e}")
+        log(traceback.format_exc())
+        return None
+
+    return blob_hash
+
+
+def put_image(pil_img):
+    try:
+        buffer = io.BytesIO()
+        pil_img.save(buffer, format="PNG")
+    except Exception as e:
+        log(f"[blob_store] put_image ERROR: {e}")
+        log(traceback.format_exc())
+        return None
+
+    return put_bytes(buffer.getvalue())
+
+
+def put_base64(b64):
+    """예전 기록의 인라인 base64 PNG → blob"""
+    try:
+        return put_bytes(base64.b64decode(b64))
+    except Exception as e:
+        log(f"[blob_store] put_base64 ERROR: {e}")
+        return None
+
+
+# ----------------------------------------------------------
+# 읽기 (실제로 보여주거나 보낼 때만 호출)
+# ----------------------------------------------------------
+def read_bytes(blob_hash):
+    try:
+        with open(blob_path(blob_hash), "rb") as f:
+            return f.read()
+    except Exception as e:
+        log(f"[blob_store] read_bytes ERROR: {e}")
+        return None
+
+
+def open_image(blob_hash):
+    try:
+        return Image.open(blob_path(blob_hash)).convert("RGB")
+    except Exception as e:
+        log(f"[blob_store] open_image ERROR: {e}")
+        log(traceback.format_exc())
+        return None
+
+
+def image_size(blob_hash):
+    """헤더만 읽어서 (width, height) 반환 — 픽셀은 디코딩하지 않음"""
+    try:
+        with Image.open(blob_path(blob_hash)) as img:
+            return img.size
+    except Exception as e:
+        log(f"[blob_store] image_size ERROR: {e}")
+        return None
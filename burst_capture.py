@@ -0,0 +1,207 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, Qt, Signal
+from PySide6.QtWidgets import QHBoxLayout, QLabel, QPushButton, QWidget
+
+from utils import log
+import blob_store
+import thumbnail_cache
+import payload_cache
+import settings
+from change_detect import signature, same_screen
+from encode_pipeline import PreparedCapture, encode_image, encode_parallel
+
+
+# ----------------------------------------------------------
+# 연속 캡처 (여러 화면 → 요청 1번)
+# ----------------------------------------------------------
+# Ctrl+B 를 누를 때마다 화면을 "대기열"에 쌓고, 다음 전송 때
+# 모두 한 요청의 이미지 part 로 보낸다 (여러 페이지 문서를 넘겨 볼 때 요청 절약).
+# 쌓을 때 바로 축소 + 인코딩하고, 직전 장과 같은 화면은 버린다.
+#
+# 설정
+#   burst_max_frames : 한 번에 보낼 최대 장수 (기본 8)
+#   burst_max_edge   : 쌓을 때 긴 변 축소 크기 (기본 1280)
+
+DEFAULT_MAX_FRAMES = 8
+DEFAULT_MAX_EDGE = 1280
+TRAY_THUMB_HEIGHT = 40
+
+
+def max_frames():
+    return max(1, int(settings.get("burst_max_frames", DEFAULT_MAX_FRAMES)))
+
+
+def downscale(pil_img, max_edge):
+    w, h = pil_img.size
+    scale = max_edge / float(max(w, h))
+    if scale >= 1:
+        return pil_img
+    from PIL import Image
+    return pil_img.convert("RGB").resize(
+        (max(1, round(w * scale)), max(1, round(h * scale))), Image.LANCZOS, reducing_gap=2.0
+    )
+
+
+class _Batch:
+    """take() 한 번에 보낼 묶음 (인코딩 중인 장도 포함)"""
+
+    def __init__(self, generation):
+        self.generation = generation    # take()/clear() 할 때마다 증가
+        self.futures = []
+        self.hashes = []        # 실제로 쌓인 장 (중복 / 실패로 버린 장은 없음)
+        self.in_flight = 0      # 아직 인코딩 중인 장
+        self.last_sig = None
+
+
+class BurstSession(QObject):
+
+    staged = Signal(int, str)   # (묶음 번호, 쌓인 장의 해시) : 썸네일 준비됨
+    skipped = Signal(str)       # 버린 이유
+
+    def __init__(self, thumb_width):
+        super().__init__()
+        self.thumb_width = thumb_width
+        self._lock = threading.Lock()
+        self._batch = _Batch(0)
+        # 순서대로 비교해야 중복 제거가 맞으므로 한 장씩 (장 안의 인코딩은 병렬)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="burst")
+
+    def count(self):
+        """쌓인 장 + 인코딩 중인 장 (버린 장은 빼고)"""
+        with self._lock:
+            return len(self._batch.hashes) + self._batch.in_flight
+
+    def generation(self):
+        """지금 쌓고 있는 묶음 번호 (이전 묶음에서 늦게 온 staged 는 무시용)"""
+        with self._lock:
+            return self._batch.generation
+
+    def add(self, pil_img):
+        """GUI 스레드에서 호출. 가득 찼으면 False"""
+        with self._lock:
+            batch = self._batch
+            if len(batch.hashes) + batch.in_flight >= max_frames():
+                return False
+            batch.in_flight += 1
+            batch.futures.append(self._executor.submit(self._stage, pil_img, batch))
+        return True
+
+    def take(self):
+        """쌓인 묶음을 꺼내고 비움 (전송 시)"""
+        with self._lock:
+            batch, self._batch = self._batch, _Batch(self._batch.generation + 1)
+        return batch
+
+    def clear(self):
+        self.take()
+
+    # ------------------------------------------------------
+    # 쌓기 (burst 스레드)
+    # ------------------------------------------------------
+    def _stage(self, pil_img, batch):
+        try:
+            return self._stage_frame(pil_img, batch)
+        finally:
+            with self._lock:
+                batch.in_flight -= 1
+
+    def _stage_frame(self, pil_img, batch):
+        t0 = time.perf_counter()
+        max_edge = int(settings.get("burst_max_edge", DEFAULT_MAX_EDGE))
+        img = downscale(pil_img, max_edge)
+        img.load()
+
+        sig = signature(img)
+        if same_screen(sig, batch.last_sig):
+            self.skipped.emit("Same screen as the previous frame, skipped")
+            return None
+
+        options = payload_cache.current_options()
+        results, _ = encode_parallel({
+            "blob": (encode_image, img, "PNG"),
+            "thumb": (thumbnail_cache.make_thumbnail, img, self.thumb_width),
+            "payload": (payload_cache.encode_payload, img, *options),
+        })
+
+        image_hash = blob_store.put_bytes(results["blob"])
+        if not image_hash or image_hash in batch.hashes:
+            self.skipped.emit("Duplicate frame, skipped")
+            return None
+
+        thumbnail_cache.store_thumbnail(image_hash, results["thumb"], self.thumb_width)
+        payload_cache.store_payload(image_hash, results["payload"], options)
+
+        with self._lock:
+            batch.hashes.append(image_hash)
+        batch.last_sig = sig
+        log(f"[burst_capture] staged {image_hash} {img.size} "
+            f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+        self.staged.emit(batch.generation, image_hash)
+        return image_hash
+
+
+def collect(batch, text):
+    """
+    워커 스레드에서 호출 (RequestWorker 의 prepare).
+    아직 인코딩 중인 장을 기다렸다가 한 요청용 PreparedCapture 로 묶는다.
+    display_hash = 대화 기록용 (공백 구분), send_hash = 해시 목록
+    """
+    t0 = time.perf_counter()
+    hashes = [h for h in (future.result() for future in batch.futures) if h]
+    timings = {"burst_wait_ms": (time.perf_counter() - t0) * 1000, "frames": len(hashes)}
+    return PreparedCapture(blob_store.join_hashes(hashes), hashes or None, text, timings)
+
+
+# ----------------------------------------------------------
+# 입력창 위 대기열 표시
+# ----------------------------------------------------------
+class BurstTray(QWidget):
+
+    def __init__(self, on_clear, parent=None):
+        super().__init__(parent)
+
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(4)
+
+        self.label = QLabel()
+        self.label.setStyleSheet("color:#ffe97a; font-size:12px;")
+        layout.addWidget(self.label)
+
+        self.thumbs = QHBoxLayout()
+        self.thumbs.setSpacing(2)
+        layout.addLayout(self.thumbs)
+        layout.addStretch()
+
+        clear_btn = QPushButton("✕")
+        clear_btn.setFixedSize(22, 22)
+        clear_btn.setToolTip("Discard staged screenshots")
+        clear_btn.setStyleSheet("color:#aaa; background:transparent; border:none;")
+        clear_btn.clicked.connect(on_clear)
+        layout.addWidget(clear_btn)
+
+        self.setLayout(layout)
+        self.count = 0
+        self.hide()
+
+    def add_frame(self, image_hash, thumb_width):
+        pix = thumbnail_cache.get_thumbnail(image_hash, thumb_width)
+        if pix is not None:
+            lbl = QLabel()
+            lbl.setPixmap(pix.scaledToHeight(TRAY_THUMB_HEIGHT, Qt.SmoothTransformation))
+            self.thumbs.addWidget(lbl)
+
+        self.count += 1
+        self.label.setText(f"{self.count}/{max_frames()} staged · Enter sends all")
+        self.show()
+
+    def clear(self):
+        while self.thumbs.count():
+            item = self.thumbs.takeAt(0)
+            if item.widget() is not None:
+                item.widget().deleteLater()
+        self.count = 0
+        self.hide()
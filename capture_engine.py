@@ -1,32 +1,351 @@
+import sys
 import time
-from PIL import ImageGrab
+import threading
+from PIL import Image, ImageGrab
 from utils import log
-from PySide6.QtWidgets import QApplication   # ★ 추가!
+from PySide6.QtWidgets import QApplication, QWidget, QRubberBand   # ★ 추가!
+from PySide6.QtCore import Qt, QRect, QSize, QEventLoop
+from PySide6.QtGui import QCursor, QGuiApplication, QPainter, QImage, QPixmap, QColor
+
+import settings
+import latency_trace
+
+try:
+    import mss   # 선택 사항: 있으면 더 빠른 캡처
+except ImportError:
+    mss = None
+
 
 # ----------------------------------------------------------
-# 전체 화면 캡처 (챗창 숨기고 찍기)
+# 캡처 백엔드
 # ----------------------------------------------------------
-def capture_full_screen(hide=None, show=None):
+# bbox = (left, top, right, bottom) 가상 화면 물리 픽셀 좌표, None = 전체
+class PilBackend:
+    name = "pil"
+
+    def grab(self, bbox=None):
+        try:
+            return ImageGrab.grab(bbox=bbox, all_screens=True)
+        except Exception:
+            return ImageGrab.grab(bbox=bbox)
+
+
+class MssBackend:
+    name = "mss"
+
+    def __init__(self):
+        # mss 핸들(DC 등)은 만든 스레드에서만 쓸 수 있으므로 스레드마다 하나씩
+        self._local = threading.local()
+
+    def _sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = self._local.sct = mss.mss()
+        return sct
+
+    def grab(self, bbox=None):
+        sct = self._sct()
+        if bbox is None:
+            area = sct.monitors[0]   # 0 = 전체 가상 화면
+        else:
+            left, top, right, bottom = bbox
+            area = {"left": left, "top": top, "width": right - left, "height": bottom - top}
+        shot = sct.grab(area)
+        return Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+
+
+BACKENDS = {"pil": PilBackend}
+if mss is not None:
+    BACKENDS["mss"] = MssBackend
+
+_backend_cache = {}
+
+
+def get_backend(name=None):
+    """name 없으면 settings 의 capture_backend ("auto" → mss 가 있으면 mss)"""
+    name = name or settings.get("capture_backend", "auto")
+    if name == "auto" or name not in BACKENDS:
+        name = "mss" if "mss" in BACKENDS else "pil"
+
+    if name not in _backend_cache:
+        _backend_cache[name] = BACKENDS[name]()
+    return _backend_cache[name]
+
+
+# ----------------------------------------------------------
+# 창 숨김 처리
+# ----------------------------------------------------------
+WDA_NONE = 0x00
+WDA_EXCLUDEFROMCAPTURE = 0x11   # Windows 10 2004+
+
+_excluded_hwnds = set()
+
+
+def exclude_from_capture(window):
+    """
+    창을 캡처 대상에서 제외 (화면에는 그대로 보임).
+    성공하면 hide/show 없이 바로 캡처할 수 있다.
+    화면 공유 / 녹화에서도 이 창이 빠지므로 설정으로 켤 때만 (capture_exclude_window).
+    """
+    if window is None or sys.platform != "win32":
+        return False
+    if not settings.get("capture_exclude_window", False):
+        return False
+
+    hwnd = int(window.winId())
+    if hwnd in _excluded_hwnds:
+        return True
+
+    try:
+        import ctypes
+        ok = ctypes.windll.user32.SetWindowDisplayAffinity(hwnd, WDA_EXCLUDEFROMCAPTURE)
+    except Exception as e:
+        log(f"[capture_engine] SetWindowDisplayAffinity 실패: {e}")
+        return False
+
+    if ok:
+        _excluded_hwnds.add(hwnd)
+    return bool(ok)
+
+
+def wait_until_hidden(window=None, timeout=0.2):
+    """
+    고정 sleep 대신 실제로 창이 사라질 때까지 대기.
+    Windows 는 DwmFlush 로 컴포지터가 새 프레임을 그릴 때까지 기다린다.
+    """
+    QApplication.processEvents()   # ★ 창 숨김 즉시 반영
+
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            user32 = ctypes.windll.user32
+            dwmapi = ctypes.windll.dwmapi
+
+            deadline = time.perf_counter() + timeout
+            hwnd = int(window.winId()) if window is not None else None
+            while hwnd and user32.IsWindowVisible(hwnd):
+                if time.perf_counter() > deadline:
+                    break
+                QApplication.processEvents()
+                time.sleep(0.005)
+
+            # 숨긴 뒤 프레임 두 번 → 화면에서 창이 완전히 빠짐
+            dwmapi.DwmFlush()
+            dwmapi.DwmFlush()
+            return
+        except Exception as e:
+            log(f"[capture_engine] DwmFlush 실패: {e}")
+
+    # 그 외 플랫폼 : 가시성 폴링 + 한 프레임 여유
+    deadline = time.perf_counter() + timeout
+    while window is not None and window.isVisible() and time.perf_counter() < deadline:
+        QApplication.processEvents()
+        time.sleep(0.005)
+    time.sleep(0.03)
+
+
+# ----------------------------------------------------------
+# 캡처 영역 계산 (Windows 는 Win32 물리 좌표, 그 외는 Qt 좌표 × DPR)
+# ----------------------------------------------------------
+def _screen_rect_physical(screen):
+    g = screen.geometry()
+    r = screen.devicePixelRatio()
+    return (round(g.left() * r), round(g.top() * r),
+            round((g.left() + g.width()) * r), round((g.top() + g.height()) * r))
+
+
+def monitor_bbox_under_cursor():
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class MONITORINFO(ctypes.Structure):
+                _fields_ = [
+                    ("cbSize", wintypes.DWORD),
+                    ("rcMonitor", wintypes.RECT),
+                    ("rcWork", wintypes.RECT),
+                    ("dwFlags", wintypes.DWORD),
+                ]
+
+            user32 = ctypes.windll.user32
+            pt = wintypes.POINT()
+            user32.GetCursorPos(ctypes.byref(pt))
+            hmon = user32.MonitorFromPoint(pt, 2)   # MONITOR_DEFAULTTONEAREST
+            info = MONITORINFO()
+            info.cbSize = ctypes.sizeof(MONITORINFO)
+            if user32.GetMonitorInfoW(hmon, ctypes.byref(info)):
+                rc = info.rcMonitor
+                return (rc.left, rc.top, rc.right, rc.bottom)
+        except Exception as e:
+            log(f"[capture_engine] monitor rect 실패: {e}")
+
+    screen = QGuiApplication.screenAt(QCursor.pos()) or QGuiApplication.primaryScreen()
+    return _screen_rect_physical(screen) if screen else None
+
+
+def active_window_bbox(own_window=None):
+    """
+    챗창 바로 아래(z-order)에 있는 보이는 최상위 창 = 직전에 쓰던 창.
+    Windows 외에는 None (→ 전체 화면).
     """
+    if sys.platform != "win32":
+        return None
+
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        dwmapi = ctypes.windll.dwmapi
+        GW_HWNDNEXT = 2
+        DWMWA_EXTENDED_FRAME_BOUNDS = 9
+        DWMWA_CLOAKED = 14
+
+        own = int(own_window.winId()) if own_window is not None else None
+        hwnd = user32.GetWindow(own, GW_HWNDNEXT) if own else user32.GetForegroundWindow()
+
+        while hwnd:
+            cloaked = ctypes.c_int(0)
+            dwmapi.DwmGetWindowAttribute(
+                hwnd, DWMWA_CLOAKED, ctypes.byref(cloaked), ctypes.sizeof(cloaked)
+            )
+            if (user32.IsWindowVisible(hwnd) and not user32.IsIconic(hwnd)
+                    and not cloaked.value and user32.GetWindowTextLengthW(hwnd) > 0):
+                rect = wintypes.RECT()
+                dwmapi.DwmGetWindowAttribute(
+                    hwnd, DWMWA_EXTENDED_FRAME_BOUNDS, ctypes.byref(rect), ctypes.sizeof(rect)
+                )
+                if rect.right - rect.left > 1 and rect.bottom - rect.top > 1:
+                    return (rect.left, rect.top, rect.right, rect.bottom)
+            hwnd = user32.GetWindow(hwnd, GW_HWNDNEXT)
+    except Exception as e:
+        log(f"[capture_engine] active window 실패: {e}")
+
+    return None
+
+
+# ----------------------------------------------------------
+# 영역 선택 (고정된 스크린샷 위에서 드래그)
+# ----------------------------------------------------------
+class RegionSelector(QWidget):
+
+    def __init__(self, frozen_img):
+        super().__init__(None, Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
+
+        self.frozen = frozen_img
+        self.selection = None
+        self._origin = None
+        self._loop = QEventLoop()
+
+        # 전체 가상 화면을 덮음
+        virtual = QRect()
+        for screen in QGuiApplication.screens():
+            virtual = virtual.united(screen.geometry())
+        self.setGeometry(virtual)
+        self.setCursor(Qt.CrossCursor)
+
+        rgb = frozen_img.convert("RGB")
+        qimg = QImage(rgb.tobytes(), rgb.width, rgb.height, 3 * rgb.width, QImage.Format_RGB888)
+        self._background = QPixmap.fromImage(qimg)
+
+        self._band = QRubberBand(QRubberBand.Rectangle, self)
+
+    def select(self):
+        self.show()
+        self.activateWindow()
+        self.setFocus()
+        self._loop.exec()
+        return self.selection
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawPixmap(self.rect(), self._background)
+        painter.fillRect(self.rect(), QColor(0, 0, 0, 70))   # 살짝 어둡게
+
+    def mousePressEvent(self, event):
+        self._origin = event.position().toPoint()
+        self._band.setGeometry(QRect(self._origin, QSize()))
+        self._band.show()
+
+    def mouseMoveEvent(self, event):
+        if self._origin is not None:
+            self._band.setGeometry(QRect(self._origin, event.position().toPoint()).normalized())
+
+    def mouseReleaseEvent(self, event):
+        rect = self._band.geometry()
+        self._finish(rect if rect.width() > 4 and rect.height() > 4 else None)
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self._finish(None)
+
+    def _finish(self, rect):
+        if rect is not None:
+            # 위젯 좌표 → 고정 이미지 픽셀 좌표
+            sx = self.frozen.width / max(1, self.width())
+            sy = self.frozen.height / max(1, self.height())
+            self.selection = (
+                round(rect.left() * sx), round(rect.top() * sy),
+                round((rect.left() + rect.width()) * sx),
+                round((rect.top() + rect.height()) * sy),
+            )
+        self.hide()
+        self._loop.quit()
+
+
+# ----------------------------------------------------------
+# 캡처 (챗창 숨기고 찍기)
+# ----------------------------------------------------------
+CAPTURE_MODES = ("full", "region", "window", "monitor")
+
+
+def capture(mode="full", hide=None, show=None, window=None, backend=None):
+    """
+    mode: "full" 전체 화면 | "region" 드래그 영역 | "window" 직전 활성 창
+          | "monitor" 마우스가 있는 모니터
     hide: 윈도우를 숨기는 함수
     show: 윈도우를 다시 보이게 하는 함수
+    window: 챗창 (있으면 캡처 제외 / 실제 숨김 대기에 사용)
+    backend: "pil" | "mss" | None(설정값)
     """
 
+    grabber = get_backend(backend)
+
     try:
+        # 창 위치 계산은 숨기기 전에 (z-order 기준)
+        bbox = None
+        if mode == "window":
+            bbox = active_window_bbox(window)
+        elif mode == "monitor":
+            bbox = monitor_bbox_under_cursor()
+
+        # 캡처 제외가 되면 숨길 필요 없음
+        if exclude_from_capture(window):
+            hide = show = None
+
         # 창 숨기기
         if hide:
             try:
                 hide()
-                QApplication.processEvents()   # ★ 창 숨김 즉시 반영
-                time.sleep(0.13)               # ★ 70ms 대기 → 안정적
+                wait_until_hidden(window)
+                latency_trace.mark("hidden")
             except:
                 log("[capture_engine] hide() 실행 실패")
 
-        # 전체 화면 캡처
+        # 캡처
         try:
-            img = ImageGrab.grab(all_screens=True)
-        except Exception:
-            img = ImageGrab.grab()
+            img = grabber.grab(bbox)
+        except Exception as e:
+            log(f"[capture_engine] {grabber.name} 실패 → pil: {e}")
+            img = PilBackend().grab(bbox)
+        latency_trace.mark("grabbed")
+
+        # 영역 선택은 화면을 고정해 둔 상태에서
+        if mode == "region" and img is not None:
+            selection = RegionSelector(img).select()
+            img = img.crop(selection) if selection else None
+            latency_trace.mark("selected")
 
         # 창 복귀
         if show:
@@ -44,3 +363,57 @@ def capture_full_screen(hide=None, show=None):
             return ImageGrab.grab()
         except:
             return None
+
+
+# ----------------------------------------------------------
+# 전체 화면 캡처 (기존 호출부 호환)
+# ----------------------------------------------------------
+def capture_full_screen(hide=None, show=None, window=None, backend=None):
+    return capture("full", hide, show, window, backend)
+
+
+# ----------------------------------------------------------
+# 백엔드 벤치마크 (숨김 → 이미지 확보까지 ms)
+# ----------------------------------------------------------
+def benchmark_backends(window=None, rounds=5):
+    results = {}
+
+    for name in BACKENDS:
+        hide_ms = []
+        grab_ms = []
+
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            if window is not None and not exclude_from_capture(window):
+                window.hide()
+                wait_until_hidden(window)
+            t1 = time.perf_counter()
+            get_backend(name).grab()
+            t2 = time.perf_counter()
+            if window is not None and not window.isVisible():
+                window.show()
+
+            hide_ms.append((t1 - t0) * 1000)
+            grab_ms.append((t2 - t1) * 1000)
+
+        results[name] = {
+            "hide_ms": sum(hide_ms) / rounds,
+            "grab_ms": sum(grab_ms) / rounds,
+            "total_ms": (sum(hide_ms) + sum(grab_ms)) / rounds,
+        }
+
+    return results
+
+
+if __name__ == "__main__":
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    # 실제 챗창 크기의 창을 띄워 숨김 비용까지 측정
+    probe = QWidget()
+    probe.resize(360, 600)
+    probe.show()
+    QApplication.processEvents()
+
+    for name, r in benchmark_backends(probe).items():
+        print(f"{name:5s}  hide {r['hide_ms']:7.1f} ms   grab {r['grab_ms']:7.1f} ms   "
+              f"total {r['total_ms']:7.1f} ms")
@@ -0,0 +1,137 @@
+from utils import log, pil_to_np
+import settings
+
+
+# ----------------------------------------------------------
+# 화면 변화 감지 (이전 캡처와 비교)
+# ----------------------------------------------------------
+# 1/8 로 줄인 흑백 이미지를 타일 단위로 비교해서
+#   "same" : 거의 그대로 → 이전 이미지 해시 재사용
+#   "crop" : 일부만 바뀜 → 바뀐 영역만 잘라서 전송
+#   "full" : 많이 바뀜 / 크기가 다름 → 전체 전송
+
+SCALE = 8              # 비교용 축소 배율
+TILE = 8               # 축소 이미지 기준 타일 크기 (원본 64px)
+PIXEL_THRESHOLD = 12   # 타일 평균 밝기 차이가 이보다 크면 "바뀜"
+SAME_RATIO = 0.002     # 바뀐 타일 비율이 이하이면 "same"
+CROP_MAX_RATIO = 0.5   # 바뀐 영역 넓이가 이하이면 "crop"
+
+
+class ChangeResult:
+    def __init__(self, kind, image_hash=None, bbox=None, changed_ratio=1.0, base=None):
+        self.kind = kind                # "same" | "crop" | "full"
+        self.image_hash = image_hash    # same 일 때 재사용할 해시
+        self.bbox = bbox                # crop 일 때 원본 좌표 (l, t, r, b)
+        self.changed_ratio = changed_ratio
+        self.base = base                # full 일 때 전송에 성공하면 새 기준 (signature, 크기, mode)
+
+
+def _signature(pil_img):
+    small = pil_img.reduce(SCALE).convert("L")
+    arr = pil_to_np(small)
+    if arr is None:
+        return None
+
+    # 타일 평균 (가장자리 나머지는 버림)
+    h, w = arr.shape
+    th, tw = h // TILE, w // TILE
+    if th == 0 or tw == 0:
+        return None
+    arr = arr[:th * TILE, :tw * TILE].astype("float32")
+    return arr.reshape(th, TILE, tw, TILE).mean(axis=(1, 3))
+
+
+def signature(pil_img):
+    return _signature(pil_img)
+
+
+def same_screen(sig_a, sig_b):
+    """두 signature 가 거의 같은 화면인지 (연속 캡처 중복 제거용)"""
+    if sig_a is None or sig_b is None or sig_a.shape != sig_b.shape:
+        return False
+    return float((abs(sig_a - sig_b) > PIXEL_THRESHOLD).mean()) <= SAME_RATIO
+
+
+class ChangeDetector:
+    """
+    기준(마지막으로 전체를 보낸) 프레임과 새 캡처를 비교한다.
+    crop 이 연속으로 max_crops 번 넘거나, 기준 이미지가 대화 기록에서 밀려났으면
+    다시 전체를 보낸다 (모델 컨텍스트에 기준 이미지가 남아 있어야 crop 이 의미가 있으므로).
+    기준은 요청이 성공한 뒤에 commit() 으로만 바뀐다 (실패 / 취소된 캡처는 모델이 못 봄).
+    known_hashes() = 지금 대화 기록에 들어 있는 이미지 해시 (없으면 확인 안 함)
+    """
+
+    def __init__(self, known_hashes=None):
+        self.known_hashes = known_hashes
+        self.reset()
+
+    def reset(self):
+        self.base_sig = None
+        self.base_size = None
+        self.base_hash = None
+        self.base_mode = None
+        self.crops_since_base = 0
+
+    def enabled(self):
+        return bool(settings.get("change_detect", True))
+
+    def check(self, pil_img, mode="full"):
+        if not self.enabled() or pil_img is None:
+            return ChangeResult("full")
+
+        sig = _signature(pil_img)
+        candidate = (sig, pil_img.size, mode) if sig is not None else None
+        if (sig is None or self.base_sig is None or mode != self.base_mode
+                or pil_img.size != self.base_size or sig.shape != self.base_sig.shape
+                or not self._base_in_context()):
+            return ChangeResult("full", base=candidate)
+
+        changed = abs(sig - self.base_sig) > PIXEL_THRESHOLD
+        ratio = float(changed.mean())
+
+        if ratio <= SAME_RATIO:
+            return ChangeResult("same", image_hash=self.base_hash, changed_ratio=ratio)
+
+        max_crops = max(0, int(settings.get("context_max_images", 2)) - 1)
+        if self.crops_since_base < max_crops:
+            rows = changed.any(axis=1).nonzero()[0]
+            cols = changed.any(axis=0).nonzero()[0]
+            unit = SCALE * TILE
+            w, h = pil_img.size
+            # 한 타일씩 여유
+            left = max(0, int(cols[0] - 1) * unit)
+            top = max(0, int(rows[0] - 1) * unit)
+            right = min(w, int(cols[-1] + 2) * unit)
+            bottom = min(h, int(rows[-1] + 2) * unit)
+
+            area = (right - left) * (bottom - top) / float(w * h)
+            if area <= CROP_MAX_RATIO:
+                return ChangeResult("crop", bbox=(left, top, right, bottom), changed_ratio=ratio)
+
+        return ChangeResult("full", changed_ratio=ratio, base=candidate)
+
+    def _base_in_context(self):
+        if self.known_hashes is None:
+            return True
+        if self.base_hash in self.known_hashes():
+            return True
+        log(f"[change_detect] base {self.base_hash} left the history → full")
+        return False
+
+    def commit(self, change, image_hash):
+        """
+        전송에 성공한 캡처를 반영 (GUI 스레드, 답변 완료 시)
+        full → 새 기준으로 등록, crop → 기준 이후 crop 횟수 증가
+        """
+        if change is None:
+            return
+        if change.kind == "crop":
+            self.crops_since_base += 1
+            return
+        if change.kind != "full" or change.base is None or not image_hash:
+            return
+
+        self.base_sig, self.base_size, self.base_mode = change.base
+        self.base_hash = image_hash
+        self.crops_since_base = 0
+        log(f"[change_detect] new base {image_hash}")
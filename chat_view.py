@@ -0,0 +1,513 @@
+from PySide6.QtWidgets import (  # type: ignore
+    QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QScrollArea, QSizePolicy
+)
+from PySide6.QtCore import Qt, QObject, QPoint, QTimer
+
+import blob_store
+import thumbnail_cache
+
+
+THUMB_WIDTH = 180
+BURST_THUMB_WIDTH = 88      # 연속 캡처 여러 장은 2열로 작게
+
+
+def format_date(date_str):
+    y, m, d = date_str.split("-")
+    return f"{y}-{m}-{d}"
+
+
+# --------------------------------------------------------
+# 날짜 구분선
+# --------------------------------------------------------
+class DateSeparator(QWidget):
+    def __init__(self, date_text):
+        super().__init__()
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 10, 0, 10)
+
+        l1 = QLabel("──────────")
+        l2 = QLabel(f"  {date_text}  ")
+        l3 = QLabel("──────────")
+
+        for l in (l1, l2, l3):
+            l.setStyleSheet("color:#555; font-size:12px;")
+
+        layout.addWidget(l1)
+        layout.addWidget(l2)
+        layout.addWidget(l3)
+        self.setLayout(layout)
+
+
+# --------------------------------------------------------
+# 말풍선
+# --------------------------------------------------------
+class ChatBubble(QWidget):
+    def __init__(self, text="", is_user=False, image_hash=None, timestamp=""):
+        super().__init__()
+
+        self.image_hash = image_hash
+        self.img_lbl = None
+        self.images = []           # [(hash, QLabel, width)]
+        self.image_loaded = False
+
+        outer = QVBoxLayout()
+        outer.setContentsMargins(0, 0, 0, 0)
+        outer.setSpacing(3)
+
+        bubble = QWidget()
+        bubble_layout = QVBoxLayout()
+        bubble_layout.setContentsMargins(10, 10, 10, 10)
+        bubble_layout.setSpacing(6)
+
+        # ----- 텍스트 영역 -----
+        self.text_label = QLabel()   # ← ★★★★★ 핵심
+        self.text_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.text_label.setWordWrap(True)
+        self.text_label.setStyleSheet("""
+            QLabel {
+                font-size: 13px;
+                color: black;
+                background: transparent;
+            }
+        """)
+        self.text_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+        self.text_label.setMaximumWidth(260)
+        self.text_label.setText(text or "")
+        bubble_layout.addWidget(self.text_label)
+
+        # ----- 이미지 영역 (자리만 잡고, 화면에 보일 때 load_image) -----
+        self.bubble_layout = bubble_layout
+        self.set_image(image_hash)
+
+        bubble.setLayout(bubble_layout)
+        self.bubble_frame = bubble
+
+        wrap = QHBoxLayout()
+        wrap.setContentsMargins(0, 0, 0, 0)
+        wrap.setSpacing(0)
+
+        if is_user:
+            bubble.setStyleSheet("background:#ffe97a; border-radius:12px; border-bottom-right-radius:4px;")
+            wrap.addStretch()
+            wrap.addWidget(bubble)
+        else:
+            bubble.setStyleSheet("background:#aee3ff; border-radius:12px; border-bottom-left-radius:4px;")
+            wrap.addWidget(bubble)
+            wrap.addStretch()
+
+        self._base_style = bubble.styleSheet()
+
+        outer.addLayout(wrap)
+
+        ts = QLabel(timestamp)
+        ts.setStyleSheet("font-size:11px; color:#aaa; padding-left:4px; padding-right:4px;")
+        ts.setAlignment(Qt.AlignRight if is_user else Qt.AlignLeft)
+
+        outer.addSpacing(2)
+        outer.addWidget(ts)
+
+        self.setLayout(outer)
+
+    def set_image(self, image_hash):
+        """image_hash: 해시 1개, 또는 연속 캡처면 공백으로 구분된 여러 개"""
+        if not image_hash or self.img_lbl is not None:
+            return
+
+        hashes = blob_store.split_hashes(image_hash)
+        width = THUMB_WIDTH if len(hashes) == 1 else BURST_THUMB_WIDTH
+
+        grid = QGridLayout()
+        grid.setContentsMargins(0, 0, 0, 0)
+        grid.setSpacing(4)
+
+        for h in hashes:
+            size = blob_store.image_size(h)
+            if not size:
+                continue
+            w, ht = size
+            lbl = QLabel()
+            lbl.setFixedSize(width, max(1, round(ht * width / w)))
+            lbl.setStyleSheet("background: transparent;")
+            index = len(self.images)
+            grid.addWidget(lbl, index // 2, index % 2)
+            self.images.append((h, lbl, width))
+
+        if not self.images:
+            return
+
+        self.image_hash = image_hash
+        self.img_lbl = self.images[0][1]
+        self.bubble_layout.addLayout(grid)
+
+    def has_pending_image(self):
+        return self.img_lbl is not None and not self.image_loaded
+
+    def highlight(self, ms=1500):
+        """검색 결과로 이동했을 때 잠깐 테두리 표시"""
+        self.bubble_frame.setStyleSheet(self._base_style + " border: 2px solid #ff8a00;")
+        QTimer.singleShot(ms, lambda: self.bubble_frame.setStyleSheet(self._base_style))
+
+    def load_image(self):
+        if not self.has_pending_image():
+            return
+
+        self.image_loaded = True
+        for image_hash, lbl, width in self.images:
+            pix = thumbnail_cache.get_thumbnail(image_hash, width)
+            if pix is not None:
+                lbl.setPixmap(pix)
+
+
+# --------------------------------------------------------
+# 채팅 화면 (최근 페이지부터, 위로 스크롤하면 이전 페이지)
+# --------------------------------------------------------
+class ChatView(QScrollArea):
+
+    PAGE_SIZE = 40
+    LOAD_MORE_MARGIN = 200     # 맨 위에서 이 거리(px) 안에 들어오면 이전 페이지
+    IMAGE_MARGIN = 300         # 화면 위아래 이 거리 안의 썸네일만 로드
+
+    def __init__(self, history_store):
+        super().__init__()
+
+        self.history_store = history_store
+
+        self.oldest_id = None
+        self.newest_id = None          # 검색으로 과거 위치를 보는 중일 때만 사용
+        self.has_newer = False         # True = 아래쪽에 아직 안 불러온 최신 메시지가 있음
+        self.has_more = True
+        self.last_date = None          # 맨 아래 날짜
+        self.top_date = None           # 맨 위 날짜
+        self.top_separator = None
+        self.pending_images = []       # 아직 썸네일을 안 그린 말풍선
+        self._keep_from_bottom = None  # 이전 페이지 삽입 후 위치 유지용
+        self._stick_to_bottom = True   # 맨 아래에 있을 때만 새 내용 따라감
+
+        self.setWidgetResizable(True)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+
+        # 스크롤바 스타일
+        self.setStyleSheet("""
+            QScrollBar:vertical {
+                width: 10px;              /* ★ 스크롤바 두께 증가 */
+                background: transparent;
+                margin: 0px;
+            }
+
+            QScrollBar::handle:vertical {
+                background: #333333;      /* ★ 어두운 회색으로 변경 */
+                border-radius: 4px;       /* 살짝 더 둥글게 */
+                min-height: 20px;
+            }
+
+            QScrollBar::handle:vertical:hover {
+                background: #999999;      /* hover 시 더 진하게 */
+            }
+
+            QScrollBar::add-line:vertical,
+            QScrollBar::sub-line:vertical {
+                height: 0px;
+                background: transparent;
+            }
+
+            QScrollBar::add-page:vertical,
+            QScrollBar::sub-page:vertical {
+                background: transparent;
+            }
+        """)
+
+        # 채팅 컨테이너
+        self.chat_container = QWidget()
+        self.chat_container.setStyleSheet("background-color: black;")
+        self.chat_container.setSizePolicy(
+            QSizePolicy.Expanding,
+            QSizePolicy.MinimumExpanding
+        )
+
+        self.chat_layout = QVBoxLayout()
+        self.chat_layout.setAlignment(Qt.AlignTop)
+        self.chat_layout.setSpacing(12)
+
+        self.chat_container.setLayout(self.chat_layout)
+        self.setWidget(self.chat_container)
+
+        bar = self.verticalScrollBar()
+        bar.valueChanged.connect(self._on_scroll)
+        bar.rangeChanged.connect(self._on_range_changed)
+
+    # ------------------------------------------------------
+    # 기록 로드
+    # ------------------------------------------------------
+    def load_initial(self):
+        self.load_older()
+        QTimer.singleShot(0, self.scroll_bottom)
+
+    def load_older(self):
+        if not self.has_more:
+            return
+
+        entries = self.history_store.load_page(self.oldest_id, self.PAGE_SIZE)
+        if len(entries) < self.PAGE_SIZE:
+            self.has_more = False
+        if not entries:
+            return
+
+        self.oldest_id = entries[0]["id"]
+
+        widgets = []
+        prev_date = None
+        for entry in entries:
+            if entry["date"] != prev_date:
+                widgets.append(DateSeparator(format_date(entry["date"])))
+                prev_date = entry["date"]
+            widgets.append(self._make_bubble(entry))
+
+        # 페이지 마지막 날짜 == 기존 맨 위 날짜 → 기존 구분선 제거
+        if self.top_separator is not None and self.top_date == prev_date:
+            self.chat_layout.removeWidget(self.top_separator)
+            self.top_separator.deleteLater()
+
+        bar = self.verticalScrollBar()
+        if self.last_date is None:
+            self.last_date = prev_date
+        else:
+            self._keep_from_bottom = bar.maximum() - bar.value()
+
+        for i, w in enumerate(widgets):
+            self.chat_layout.insertWidget(i, w)
+
+        self.top_separator = widgets[0]
+        self.top_date = entries[0]["date"]
+
+    def load_newer(self):
+        """과거 위치를 보는 중 아래로 스크롤 → 다음 페이지"""
+        if not self.has_newer:
+            return
+
+        entries = self.history_store.load_after(self.newest_id, self.PAGE_SIZE)
+        if len(entries) < self.PAGE_SIZE:
+            self.has_newer = False
+        if not entries:
+            return
+
+        self.newest_id = entries[-1]["id"]
+        for entry in entries:
+            self.add_date_separator_if_needed(entry["date"])
+            self.chat_layout.addWidget(self._make_bubble(entry))
+
+    def load_around(self, message_id):
+        """message_id 앞뒤 반 페이지씩만 불러온 화면으로 교체"""
+        half = self.PAGE_SIZE // 2
+        before = self.history_store.load_page(message_id + 1, half + 1)   # 대상 포함
+        after = self.history_store.load_after(message_id, half)
+        if not before:
+            return False
+
+        self.clear()
+        self.has_more = len(before) == half + 1
+        self.has_newer = len(after) == half
+        self._stick_to_bottom = False
+
+        entries = before + after
+        self.oldest_id = entries[0]["id"]
+        self.newest_id = entries[-1]["id"]
+
+        for entry in entries:
+            self.add_date_separator_if_needed(entry["date"])
+            self.chat_layout.addWidget(self._make_bubble(entry))
+        return True
+
+    def return_to_latest(self):
+        """검색으로 과거를 보던 중 새 메시지가 오면 최신 화면으로 복귀"""
+        self.clear()
+        self.load_initial()
+
+    def clear(self):
+        while self.chat_layout.count():
+            item = self.chat_layout.takeAt(0)
+            if item.widget() is not None:
+                item.widget().deleteLater()
+
+        self.oldest_id = None
+        self.newest_id = None
+        self.has_more = True
+        self.has_newer = False
+        self.last_date = None
+        self.top_date = None
+        self.top_separator = None
+        self.pending_images = []
+        self._keep_from_bottom = None
+
+    def find_bubble(self, message_id):
+        for i in range(self.chat_layout.count()):
+            widget = self.chat_layout.itemAt(i).widget()
+            if getattr(widget, "message_id", None) == message_id:
+                return widget
+        return None
+
+    def jump_to(self, message_id, allow_reload=True):
+        """
+        검색 결과로 이동. 아직 안 불러온 메시지면 그 주변만 새로 불러온다.
+        allow_reload=False : 화면을 바꾸지 않음 (스트리밍 중인 말풍선 보호)
+        """
+        bubble = self.find_bubble(message_id)
+        if bubble is None:
+            if not allow_reload or not self.load_around(message_id):
+                return False
+            bubble = self.find_bubble(message_id)
+            if bubble is None:
+                return False
+
+        self._stick_to_bottom = False
+        # 레이아웃이 끝난 뒤 위치가 정해지므로 다음 차례에 스크롤
+        QTimer.singleShot(0, lambda: self._scroll_to(bubble))
+        return True
+
+    def _scroll_to(self, bubble):
+        self.ensureWidgetVisible(bubble, 0, self.viewport().height() // 3)
+        bubble.highlight()
+        self.load_visible_images()
+
+    def _make_bubble(self, entry):
+        is_user = entry["role"] == "user"
+        bubble = ChatBubble(
+            entry["text"], is_user, entry.get("img") if is_user else None,
+            entry["timestamp"]
+        )
+        bubble.message_id = entry["id"]
+        if bubble.has_pending_image():
+            self.pending_images.append(bubble)
+        return bubble
+
+    # ------------------------------------------------------
+    # 새 메시지 (맨 아래에 추가)
+    # ------------------------------------------------------
+    def add_date_separator_if_needed(self, date_str):
+        if self.last_date != date_str:
+            sep = DateSeparator(format_date(date_str))
+            self.chat_layout.addWidget(sep)
+            self.last_date = date_str
+            if self.top_separator is None:
+                self.top_separator = sep
+                self.top_date = date_str
+
+    def add_widget(self, widget, date_str=None):
+        if self.has_newer:
+            self.return_to_latest()
+        if date_str:
+            self.add_date_separator_if_needed(date_str)
+        self.chat_layout.addWidget(widget)
+
+        if isinstance(widget, ChatBubble) and widget.has_pending_image():
+            self.pending_images.append(widget)
+            QTimer.singleShot(0, self.load_visible_images)
+
+    def insert_before(self, widget, anchor):
+        index = self.chat_layout.indexOf(anchor)
+        if index < 0:
+            self.add_widget(widget)
+        else:
+            self.chat_layout.insertWidget(index, widget)
+
+    def attach_image(self, bubble, image_hash):
+        """인코딩이 끝난 뒤 말풍선에 이미지 붙이기"""
+        bubble.set_image(image_hash)
+        if bubble.has_pending_image():
+            self.pending_images.append(bubble)
+            QTimer.singleShot(0, self.load_visible_images)
+
+    def scroll_bottom(self):
+        self._stick_to_bottom = True
+        bar = self.verticalScrollBar()
+        bar.setValue(bar.maximum())
+
+    def is_at_bottom(self):
+        bar = self.verticalScrollBar()
+        return bar.value() >= bar.maximum() - 4
+
+    # ------------------------------------------------------
+    # 스크롤 처리
+    # ------------------------------------------------------
+    def _on_scroll(self, value):
+        if self._keep_from_bottom is None:
+            self._stick_to_bottom = self.is_at_bottom()
+        if value <= self.LOAD_MORE_MARGIN and self.has_more and self._keep_from_bottom is None:
+            self.load_older()
+        if self.has_newer and self.is_at_bottom():
+            self.load_newer()
+        self.load_visible_images()
+
+    def _on_range_changed(self, minimum, maximum):
+        if self._keep_from_bottom is not None:
+            keep = self._keep_from_bottom
+            self._keep_from_bottom = None
+            self.verticalScrollBar().setValue(maximum - keep)
+        elif self._stick_to_bottom:
+            self.verticalScrollBar().setValue(maximum)
+        self.load_visible_images()
+
+    def load_visible_images(self):
+        if not self.pending_images:
+            return
+
+        top = self.verticalScrollBar().value() - self.IMAGE_MARGIN
+        bottom = top + self.viewport().height() + 2 * self.IMAGE_MARGIN
+
+        remaining = []
+        for bubble in self.pending_images:
+            y = bubble.mapTo(self.chat_container, QPoint(0, 0)).y()
+            if y + bubble.height() >= top and y <= bottom:
+                bubble.load_image()
+            if bubble.has_pending_image():
+                remaining.append(bubble)
+        self.pending_images = remaining
+
+
+# --------------------------------------------------------
+# 스트리밍 텍스트 출력 (프레임당 최대 1번 갱신)
+# --------------------------------------------------------
+class StreamingTextSink(QObject):
+    """
+    delta 는 버퍼에만 쌓고, 타이머가 FLUSH_INTERVAL_MS 마다 한 번
+    setText 한다. 스크롤은 ChatView 가 맨 아래에 있을 때만 따라간다.
+    """
+
+    FLUSH_INTERVAL_MS = 33   # ≈ 30 Hz
+
+    def __init__(self, label, parent=None):
+        super().__init__(parent)
+
+        self.label = label
+        self._chunks = []
+        self._text = ""
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self._timer.timeout.connect(self.flush)
+
+    def text(self):
+        if self._chunks:
+            self._text += "".join(self._chunks)
+            self._chunks = []
+        return self._text
+
+    def append(self, chunk):
+        if not chunk:
+            return
+        self._chunks.append(chunk)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        if not self._chunks:
+            self._timer.stop()
+            return
+        self.label.setText(self.text())
+
+    def finish(self, final_text=None):
+        self._timer.stop()
+        if final_text is not None:
+            self._chunks = []
+            self._text = final_text
+        self.label.setText(self.text())
+        self.deleteLater()
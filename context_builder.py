@@ -0,0 +1,169 @@
+import math
+
+from utils import log
+import blob_store
+import payload_cache
+import settings
+
+
+# ----------------------------------------------------------
+# 요청 contents 조립 (이미지 보존 정책 + 토큰 예산)
+# ----------------------------------------------------------
+# history 항목: {"role": "user" | "model", "text": str, "image_hash": str | list | None}
+#   (연속 캡처는 image_hash 가 해시 목록)
+#
+# 정책
+#   context_max_images    : 최근 이미지 N장만 실제로 보냄 (기본 2)
+#   context_older_images  : 그보다 오래된 이미지 처리
+#                             "describe" → 바로 뒤 모델 답변 요약으로 대체 (기본)
+#                             "drop"     → 버림
+#   context_token_budget  : 예상 토큰이 넘으면 오래된 항목부터 제외 (0 = 제한 없음)
+#                           (요약이 있으면 요약을 먼저 넣고 남은 예산으로 최근 대화)
+
+DEFAULT_MAX_IMAGES = 2
+DEFAULT_OLDER_IMAGES = "describe"
+DEFAULT_TOKEN_BUDGET = 32000
+
+DESCRIBE_CHARS = 300
+
+# Gemini 2.5 이미지 토큰 규칙: 양 변 ≤ 384px → 258, 아니면 768px 타일당 258
+IMAGE_TILE_TOKENS = 258
+IMAGE_SMALL_EDGE = 384
+IMAGE_TILE_EDGE = 768
+
+
+def current_policy():
+    return {
+        "max_images": int(settings.get("context_max_images", DEFAULT_MAX_IMAGES)),
+        "older_images": settings.get("context_older_images", DEFAULT_OLDER_IMAGES),
+        "token_budget": int(settings.get("context_token_budget", DEFAULT_TOKEN_BUDGET)),
+    }
+
+
+# ----------------------------------------------------------
+# 크기 추정
+# ----------------------------------------------------------
+def estimate_text_tokens(text):
+    # 대략 4 byte ≈ 1 token (한글은 더 비싸므로 utf-8 길이 기준)
+    return math.ceil(len(text.encode("utf-8")) / 4) if text else 0
+
+
+def estimate_image_tokens(blob_hash):
+    size = blob_store.image_size(blob_hash)
+    if not size:
+        return IMAGE_TILE_TOKENS
+    return estimate_size_tokens(*size)
+
+
+def estimate_size_tokens(w, h):
+    """원본 크기 w x h 이미지를 업로드 설정대로 줄여 보낼 때의 토큰"""
+    max_edge = payload_cache.current_options()[0]
+    scale = min(1.0, max_edge / max(w, h))
+    w, h = w * scale, h * scale
+
+    if w <= IMAGE_SMALL_EDGE and h <= IMAGE_SMALL_EDGE:
+        return IMAGE_TILE_TOKENS
+    tiles = math.ceil(w / IMAGE_TILE_EDGE) * math.ceil(h / IMAGE_TILE_EDGE)
+    return tiles * IMAGE_TILE_TOKENS
+
+
+def _describe(history, index):
+    """index 이미지 바로 뒤의 모델 답변으로 이미지 설명 문자열 생성"""
+    for item in history[index + 1:]:
+        if item.get("role") == "model" and item.get("text"):
+            desc = item["text"].strip().replace("\n", " ")
+            if len(desc) > DESCRIBE_CHARS:
+                desc = desc[:DESCRIBE_CHARS] + "…"
+            return f"[Earlier screenshot, previously described as: {desc}]"
+    return None
+
+
+# ----------------------------------------------------------
+# 조립
+# ----------------------------------------------------------
+def build_contents(system_prompt, history, policy=None, summary=None):
+    """
+    summary = 창에서 밀려난 예전 대화 요약 (conversation_summary)
+    return: (contents, stats)
+    stats = 보낸/대체/버린 이미지 수, 예상 토큰, 예상 바이트
+    """
+    from google.genai import types
+
+    policy = policy or current_policy()
+
+    stats = {
+        "entries": 0,
+        "images_sent": 0,
+        "images_described": 0,
+        "images_dropped": 0,
+        "est_tokens": estimate_text_tokens(system_prompt),
+        "est_bytes": len(system_prompt.encode("utf-8")),
+        "summary_tokens": 0,
+    }
+
+    if summary:
+        summary = f"[Summary of the earlier conversation]\n{summary}"
+        stats["summary_tokens"] = estimate_text_tokens(summary)
+        stats["est_tokens"] += stats["summary_tokens"]
+        stats["est_bytes"] += len(summary.encode("utf-8"))
+
+    # 1) 최신 항목부터 보면서 이미지 정책 적용 + 예산 계산
+    images_left = policy["max_images"]
+    budget = policy["token_budget"]
+    picked = []   # (text, [image_hash]) 최신 → 과거 순
+    seen_images = set()   # 같은 이미지(재사용된 해시)는 가장 최근 것만 전송
+
+    for index in range(len(history) - 1, -1, -1):
+        item = history[index]
+        text = item.get("text") or ""
+        tokens = estimate_text_tokens(text)
+
+        # 한 항목에 여러 장일 수 있음 (연속 캡처)
+        hashes = [h for h in blob_store.split_hashes(item.get("image_hash")) if h not in seen_images]
+        seen_images.update(hashes)
+
+        # 지금 질문의 이미지는 장수 제한 없이 모두 보냄
+        latest = not picked
+        sent = []
+        for image_hash in hashes:
+            if latest or images_left > 0:
+                images_left = max(0, images_left - 1)
+                sent.append(image_hash)
+                tokens += estimate_image_tokens(image_hash)
+
+        skipped = len(hashes) - len(sent)
+        if skipped:
+            desc = _describe(history, index) if policy["older_images"] == "describe" else None
+            if desc:
+                text = f"{text}\n{desc}" if text else desc
+                tokens = estimate_text_tokens(text) + sum(estimate_image_tokens(h) for h in sent)
+                stats["images_described"] += skipped
+            else:
+                stats["images_dropped"] += skipped
+
+        # 가장 최근 항목(지금 질문)은 예산과 상관없이 항상 포함
+        if budget and picked and stats["est_tokens"] + tokens > budget:
+            break
+
+        stats["est_tokens"] += tokens
+        picked.append((text, sent))
+
+    # 2) 과거 → 최신 순으로 contents 작성
+    contents = [system_prompt]
+    if summary:
+        contents.append(summary)
+    for text, image_hashes in reversed(picked):
+        if text:
+            contents.append(text)
+            stats["est_bytes"] += len(text.encode("utf-8"))
+
+        for image_hash in image_hashes:
+            data, mime_type = payload_cache.get_payload(image_hash)
+            if data:
+                contents.append(types.Part.from_bytes(data=data, mime_type=mime_type))
+                stats["images_sent"] += 1
+                stats["est_bytes"] += len(data)
+
+    stats["entries"] = len(picked)
+    log(f"[context_builder] {stats}")
+    return contents, stats
@@ -0,0 +1,163 @@
+import time
+import threading
+
+from utils import load_json, save_json, log
+import blob_store
+import settings
+
+
+# ----------------------------------------------------------
+# 대화 요약 (max_history 를 넘은 오래된 대화를 버리지 않고 접어 둠)
+# ----------------------------------------------------------
+# 최근 대화만 그대로 보내고, 창에서 밀려난 항목은 요약 한 덩어리로 합친다.
+#   요청 = 시스템 프롬프트 + [요약] + (아직 요약 중인 항목) + 최근 대화
+# 요약은 밀려날 때 한 번만 (백그라운드, 가벼운 모델로) 만들고
+# storage/summary.json 에 저장해서 다음 실행 때도 이어서 쓴다 (아직 요약 안 된 항목도 같이).
+# 요약이 끝나기 전이나 실패했을 때는 밀려난 항목을 그대로 보낸다 (맥락 손실 없음).
+# 전체 크기는 context_builder 의 context_token_budget 이 제한한다.
+#
+# 설정
+#   context_summary       : 사용 여부 (기본 true, false 면 예전처럼 잘라냄)
+#   summary_model         : 요약에 쓰는 모델 (기본 gemini-2.5-flash-lite, 무료 한도가 따로 잡힘)
+#   summary_max_words     : 요약 길이 (기본 250 단어)
+#   summary_max_age_hours : 이보다 오래된 저장 요약은 시작할 때 버림 (기본 12)
+
+SUMMARY_PATH = "storage/summary.json"
+
+DEFAULT_MODEL = "gemini-2.5-flash-lite"
+DEFAULT_MAX_WORDS = 250
+DEFAULT_MAX_AGE_HOURS = 12
+
+FOLD_BATCH = 4          # 접은 뒤 남길 여유 (max_history 10 → 요약 요청 1번당 3문답)
+MAX_PENDING = 40        # 요약이 계속 실패할 때 쌓아 두는 최대 항목 수
+ITEM_CHARS = 2000       # 요약 프롬프트에 넣는 항목당 최대 글자
+
+
+def enabled():
+    return bool(settings.get("context_summary", True))
+
+
+def summary_model():
+    return settings.get("summary_model", DEFAULT_MODEL)
+
+
+def build_prompt(previous, items):
+    max_words = int(settings.get("summary_max_words", DEFAULT_MAX_WORDS))
+
+    lines = []
+    for item in items:
+        who = "User" if item.get("role") == "user" else "Assistant"
+        text = (item.get("text") or "").strip()
+        if len(text) > ITEM_CHARS:
+            text = text[:ITEM_CHARS] + "…"
+        shots = len(blob_store.split_hashes(item.get("image_hash")))
+        if shots:
+            text = f"[{shots} screenshot(s) attached] {text}"
+        lines.append(f"{who}: {text}")
+
+    return (
+        "You maintain a running summary of a conversation between a user and an "
+        "assistant that answers questions about the user's screen.\n"
+        "Merge the earlier summary and the new turns into one updated summary. "
+        "Keep facts, decisions, names, file/code identifiers, numbers and open "
+        "questions; drop greetings and repetition. Describe screenshots only "
+        "through what the assistant said about them. "
+        f"Write at most {max_words} words, in the language the user used.\n\n"
+        f"Earlier summary:\n{previous or '(none)'}\n\n"
+        "New turns:\n" + "\n".join(lines)
+    )
+
+
+class RollingSummary:
+    """
+    fold(items, summarize) : 창에서 밀려난 항목을 넘김 (워커 스레드)
+    text / pending()       : 요청에 넣을 요약 / 아직 요약되지 않은 항목
+    summarize(previous, items) -> str 는 실제 API 호출 (GeminiClient 가 제공)
+    """
+
+    def __init__(self, path=SUMMARY_PATH):
+        self.path = path
+        self.text = ""
+        self.folded = 0         # 지금까지 요약에 합쳐진 항목 수
+        self._pending = []      # [(번호, 항목)] : 요약 중에 앞쪽이 잘려도 번호로 지움
+        self._next_seq = 0
+        self._running = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        data = load_json(self.path)
+        if not data:
+            return
+
+        max_age = float(settings.get("summary_max_age_hours", DEFAULT_MAX_AGE_HOURS)) * 3600
+        if time.time() - data.get("updated", 0) > max_age:
+            log("[conversation_summary] saved summary is stale → starting fresh")
+            return
+
+        self.text = data.get("text", "")
+        self.folded = data.get("folded", 0)
+        self._append(data.get("pending", []))
+
+    def _append(self, items):
+        for item in items:
+            self._pending.append((self._next_seq, item))
+            self._next_seq += 1
+        if len(self._pending) > MAX_PENDING:
+            del self._pending[:len(self._pending) - MAX_PENDING]
+
+    def _save(self):
+        save_json(self.path, {
+            "text": self.text,
+            "folded": self.folded,
+            "pending": [item for _, item in self._pending],
+            "updated": time.time(),
+        })
+
+    def pending(self):
+        with self._lock:
+            return [item for _, item in self._pending]
+
+    def fold(self, items, summarize):
+        with self._lock:
+            self._append(items)
+            # 요약이 끝나기 전에 꺼져도 다음 실행 때 다시 접음
+            self._save()
+            if self._running:
+                return
+            self._running = True
+
+        threading.Thread(
+            target=self._run, args=(summarize,), name="Summary", daemon=True
+        ).start()
+
+    def _run(self, summarize):
+        while True:
+            with self._lock:
+                batch = list(self._pending)
+                previous = self.text
+                if not batch:
+                    self._running = False
+                    return
+
+            t0 = time.perf_counter()
+            try:
+                text = summarize(previous, [item for _, item in batch])
+            except Exception as e:
+                # 밀려난 항목은 그대로 남겨 두고 다음 fold 때 다시 시도
+                log(f"[conversation_summary] summarize ERROR: {e}")
+                text = None
+
+            with self._lock:
+                if not text:
+                    self._running = False
+                    return
+
+                self.text = text
+                self.folded += len(batch)
+                done = {seq for seq, _ in batch}
+                self._pending = [p for p in self._pending if p[0] not in done]
+                self._save()
+
+            log(f"[conversation_summary] folded {len(batch)} items → {len(text)} chars "
+                f"({(time.perf_counter() - t0) * 1000:.0f} ms)")
@@ -0,0 +1,169 @@
+import os
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import log
+import blob_store
+import thumbnail_cache
+import payload_cache
+import ocr_prepass
+import settings
+
+
+# ----------------------------------------------------------
+# 캡처 인코딩 단계 (GUI 스레드 밖에서 실행)
+# ----------------------------------------------------------
+# 한 번 디코딩된 프레임에서
+#   - 보관용 PNG (blob)
+#   - 말풍선 썸네일
+#   - 업로드용 JPEG/WebP (payload)
+# 를 스레드 풀에서 동시에 만든다. Pillow 인코더는 GIL 을 풀기 때문에
+# 코어 수만큼 실제로 병렬로 돈다.
+#
+# 설정
+#   blob_png_level : 보관용 PNG 압축 레벨 0~9 (기본 1 = 빠름)
+#   업로드 코덱/품질은 payload_cache (upload_format / upload_quality)
+#   글자 위주 화면의 OCR 대체는 ocr_prepass (ocr_prepass 등)
+
+DEFAULT_PNG_LEVEL = 1
+
+ENCODE_WORKERS = max(2, min(4, os.cpu_count() or 2))
+_pool = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="encode")
+
+last_timings = {}
+
+
+def encode_image(pil_img, codec="PNG", quality=90, compress_level=None):
+    """codec: PNG | JPEG | WEBP"""
+    codec = codec.upper()
+    buffer = io.BytesIO()
+
+    if codec == "PNG":
+        if compress_level is None:
+            compress_level = int(settings.get("blob_png_level", DEFAULT_PNG_LEVEL))
+        pil_img.save(buffer, format="PNG", compress_level=compress_level)
+    elif codec == "JPEG":
+        pil_img.convert("RGB").save(buffer, format="JPEG", quality=quality)
+    elif codec == "WEBP":
+        pil_img.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        raise ValueError(f"unknown codec: {codec}")
+
+    return buffer.getvalue()
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def encode_parallel(jobs):
+    """
+    jobs = {이름: (함수, 인자, ...)} 를 인코딩 풀에서 동시에 실행.
+    return: ({이름: 결과}, {이름_ms: 걸린 시간})
+    """
+    futures = {name: _pool.submit(_timed, *job) for name, job in jobs.items()}
+    results, timings = {}, {}
+    for name, future in futures.items():
+        results[name], timings[f"{name}_ms"] = future.result()
+    return results, timings
+
+
+# ----------------------------------------------------------
+# 캡처 1장 처리
+# ----------------------------------------------------------
+class PreparedCapture:
+    def __init__(self, display_hash, send_hash, send_text, timings, change=None):
+        self.display_hash = display_hash   # 말풍선 / 대화 기록용 (전체 화면)
+        self.send_hash = send_hash         # 실제로 보낼 이미지 (crop 일 수 있음)
+        self.send_text = send_text
+        self.timings = timings
+        self.change = change               # 답변이 끝나면 detector.commit(change, display_hash)
+
+
+def _crop_note(bbox, size):
+    left, top, right, bottom = bbox
+    return (
+        f"[Only the changed region of the screen is attached "
+        f"(x={left}, y={top}, {right - left}x{bottom - top} of "
+        f"{size[0]}x{size[1]}); the rest is unchanged from the "
+        f"previous screenshot.]"
+    )
+
+
+def prepare_capture(img, text, mode, detector, thumb_width):
+    """
+    변화 감지 → (보관 PNG, 썸네일, 업로드 바이트) 동시 인코딩 → 저장.
+    워커 스레드에서 호출된다.
+    """
+    global last_timings
+
+    timings = {}
+    t_start = time.perf_counter()
+
+    # 이전 캡처와 비교 : same → 해시 재사용 / crop → 바뀐 부분만 전송
+    change, timings["detect_ms"] = _timed(detector.check, img, mode)
+    if change.kind == "same":
+        timings["total_ms"] = (time.perf_counter() - t_start) * 1000
+        last_timings = timings
+        return PreparedCapture(change.image_hash, change.image_hash, text, timings)
+
+    img.load()   # 여러 스레드가 같은 픽셀을 읽기 전에 확실히 로드
+    send_img = img.crop(change.bbox) if change.kind == "crop" else img
+    options = payload_cache.current_options()
+
+    # OCR 은 자기 풀에서 인코딩과 동시에 (시간 제한 있음)
+    ocr_job = ocr_prepass.start(send_img)
+
+    jobs = {
+        "blob": (encode_image, img, "PNG"),
+        "thumb": (thumbnail_cache.make_thumbnail, img, thumb_width),
+        "payload": (payload_cache.encode_payload, send_img, *options),
+    }
+    if change.kind == "crop":
+        jobs["crop_blob"] = (encode_image, send_img, "PNG")
+
+    results, encode_timings = encode_parallel(jobs)
+    timings.update(encode_timings)
+    ocr = ocr_prepass.wait(ocr_job)
+    if ocr is not None:
+        timings["ocr_ms"] = ocr.elapsed_ms
+
+    t_store = time.perf_counter()
+    display_hash = blob_store.put_bytes(results["blob"])
+    send_hash = display_hash
+    send_text = text
+
+    if display_hash:
+        thumbnail_cache.store_thumbnail(display_hash, results["thumb"], thumb_width)
+
+    if change.kind == "crop":
+        send_hash = blob_store.put_bytes(results["crop_blob"])
+        note = _crop_note(change.bbox, img.size)
+        send_text = f"{text}\n{note}" if text else note
+
+    # 글자 위주 화면이면 픽셀 대신 OCR 텍스트 (+ 작은 미리보기) 를 보냄
+    use_ocr = ocr_prepass.accept(ocr, send_img)
+    if use_ocr:
+        send_hash, send_text, timings["ocr"] = ocr_prepass.substitute(
+            send_img, send_text, ocr, len(results["payload"])
+        )
+    elif send_hash:
+        payload_cache.store_payload(send_hash, results["payload"], options)
+
+    if use_ocr:
+        # 모델이 이 화면을 그림으로 받지 않으므로 crop 기준으로 쓰지 않음
+        change.base = None
+        if change.kind == "full":
+            detector.reset()
+
+    timings["store_ms"] = (time.perf_counter() - t_store) * 1000
+    timings["total_ms"] = (time.perf_counter() - t_start) * 1000
+    timings["pixels"] = img.width * img.height
+    last_timings = timings
+    log(f"[encode_pipeline] {change.kind} {timings}")
+
+    # 기준 등록은 전송에 성공한 뒤 (main 의 답변 완료 처리)
+    return PreparedCapture(display_hash, send_hash, send_text, timings, change)
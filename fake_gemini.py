@@ -0,0 +1,142 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# ----------------------------------------------------------
+# 로컬 가짜 Gemini 서버 (벤치마크용, API 키 / 네트워크 불필요)
+# ----------------------------------------------------------
+# google-genai SDK 가 부르는 엔드포인트만 흉내낸다.
+#   POST .../models/<model>:streamGenerateContent?alt=sse → SSE 로 조금씩 응답
+#   POST .../models/<model>:generateContent               → 한 번에 응답
+#   GET  .../models/<model>                               → 모델 정보 (warm 용)
+#
+#   GeminiClient(api_key="fake", base_url=server.url)
+#
+# latency    : 요청을 받고 첫 토큰까지 걸리는 시간 (초)
+# token_rate : 초당 토큰 수
+# reply_tokens / chunk_tokens : 답변 길이 / SSE 이벤트 하나에 담는 토큰 수
+
+WORD = "lorem"      # 1 단어 ≈ 1 토큰으로 취급
+
+
+class FakeGeminiServer:
+
+    def __init__(self, latency=0.3, token_rate=80.0, reply_tokens=200, chunk_tokens=8):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.reply_tokens = reply_tokens
+        self.chunk_tokens = chunk_tokens
+
+        self.requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="FakeGemini", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, size):
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += size
+
+    def chunks(self):
+        """보낼 텍스트 조각들"""
+        left = self.reply_tokens
+        while left > 0:
+            n = min(self.chunk_tokens, left)
+            left -= n
+            yield " ".join([WORD] * n) + " "
+
+
+def _response_json(text, final=False):
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if final:
+        candidate["finishReason"] = "STOP"
+    return {"candidates": [candidate]}
+
+
+def _make_handler(server):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, data, status=200):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            # 모델 정보 조회 (GeminiClient.warm)
+            name = self.path.split("?")[0].rsplit("/", 1)[-1]
+            self._send_json({"name": f"models/{name}", "displayName": name})
+
+        def do_POST(self):
+            size = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(size)
+            server._count(size)
+
+            time.sleep(server.latency)
+
+            if ":streamGenerateContent" in self.path:
+                self._stream()
+            elif ":generateContent" in self.path:
+                self._send_json(_response_json("".join(server.chunks()), final=True))
+            else:
+                self._send_json({"error": {"code": 404, "message": self.path}}, 404)
+
+        def _stream(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            chunks = list(server.chunks())
+            for i, text in enumerate(chunks):
+                if i:
+                    time.sleep(server.chunk_tokens / server.token_rate)
+                event = _response_json(text, final=(i == len(chunks) - 1))
+                self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8"))
+                self.wfile.flush()
+
+    return Handler
+
+
+if __name__ == "__main__":
+    with FakeGeminiServer() as fake:
+        print(f"fake Gemini listening on {fake.url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,332 @@
+import os
+import json
+import sqlite3
+import threading
+
+from utils import log
+import blob_store
+
+
+# ----------------------------------------------------------
+# 대화 기록 저장소 (SQLite, WAL)
+# ----------------------------------------------------------
+# 메시지 한 개 저장 = INSERT 한 번 → 기록이 쌓여도 저장 비용은 일정하다.
+# 예전 chat_history.json 은 처음 열 때 한 번만 옮겨 온다.
+# (defer_migrations=True 면 옮기기 / 색인은 migrate() 를 부를 때 → 창을 먼저 그림)
+# img 칸에는 스크린샷 본체가 아니라 blob_store 해시만 저장한다.
+#
+# 검색: FTS5 가상 테이블 messages_fts (external content = messages).
+# 트리거로 INSERT/UPDATE/DELETE 때마다 색인이 같이 갱신된다.
+# FTS5 가 없는 SQLite 빌드에서는 LIKE 검색으로 대신한다.
+
+DEFAULT_DB_PATH = "storage/chat_history.db"
+LEGACY_JSON_PATH = "storage/chat_history.json"
+
+_COLUMNS = ("id", "role", "text", "img", "timestamp", "date")
+
+
+class HistoryStore:
+
+    def __init__(self, path=DEFAULT_DB_PATH, legacy_json_path=LEGACY_JSON_PATH,
+                 defer_migrations=False):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self.path = path
+        self.legacy_json_path = legacy_json_path
+        self.fts = False    # migrate() 전에는 LIKE 검색
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                role      TEXT NOT NULL,
+                text      TEXT,
+                img       TEXT,
+                timestamp TEXT,
+                date      TEXT
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key   TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self.conn.commit()
+
+        if not defer_migrations:
+            self.migrate()
+
+    # ------------------------------------------------------
+    # 이전 / 색인 (기록이 많으면 오래 걸림, 대부분 처음 한 번만)
+    # ------------------------------------------------------
+    def needs_migration(self):
+        with self._lock:
+            legacy = (
+                self.legacy_json_path and os.path.exists(self.legacy_json_path)
+                and not self._get_meta("legacy_migrated")
+            )
+            return bool(
+                legacy or not self._get_meta("inline_images_migrated")
+                or not self._get_meta("fts_built")
+            )
+
+    def migrate(self):
+        if self.legacy_json_path:
+            self._migrate_legacy_json(self.legacy_json_path)
+        self._migrate_inline_images()
+        self.fts = self._init_fts()
+
+    # ------------------------------------------------------
+    # 저장 / 조회
+    # ------------------------------------------------------
+    def append(self, role, text, img, timestamp, date):
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT INTO messages (role, text, img, timestamp, date) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (role, text, img, timestamp, date)
+            )
+            self.conn.commit()
+            return cur.lastrowid
+
+    def load_all(self):
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM messages ORDER BY id"
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def load_page(self, before_id=None, limit=50):
+        """before_id 보다 오래된 메시지 limit 개 (오래된 순)"""
+        with self._lock:
+            if before_id is None:
+                rows = self.conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM messages "
+                    "ORDER BY id DESC LIMIT ?",
+                    (limit,)
+                ).fetchall()
+            else:
+                rows = self.conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM messages "
+                    "WHERE id < ? ORDER BY id DESC LIMIT ?",
+                    (before_id, limit)
+                ).fetchall()
+        rows.reverse()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def load_after(self, after_id, limit=50):
+        """after_id 보다 새로운 메시지 limit 개 (오래된 순)"""
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM messages "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit)
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            try:
+                # WAL 파일을 본 DB 로 합치고 비움
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except Exception as e:
+                log(f"[history_store] checkpoint ERROR: {e}")
+            self.conn.close()
+
+    # ------------------------------------------------------
+    # 전문 검색
+    # ------------------------------------------------------
+    def _init_fts(self):
+        try:
+            with self._lock:
+                self.conn.executescript("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                        text, content='messages', content_rowid='id',
+                        tokenize='unicode61 remove_diacritics 2'
+                    );
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+                        INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+                        INSERT INTO messages_fts(messages_fts, rowid, text)
+                        VALUES ('delete', old.id, old.text);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF text ON messages BEGIN
+                        INSERT INTO messages_fts(messages_fts, rowid, text)
+                        VALUES ('delete', old.id, old.text);
+                        INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+                    END;
+                """)
+
+                # 트리거가 생기기 전에 쌓인 기록은 한 번만 색인
+                if not self._get_meta("fts_built"):
+                    self.conn.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+                    self._set_meta("fts_built", "1")
+                self.conn.commit()
+            return True
+        except sqlite3.OperationalError as e:
+            log(f"[history_store] FTS5 unavailable, using LIKE search: {e}")
+            return False
+
+    @staticmethod
+    def _fts_query(query):
+        # 단어마다 접두어 검색 ("스크린샷" → "스크린샷을" 도 찾음), 모두 포함(AND)
+        terms = [t.replace('"', "") for t in query.split()]
+        return " ".join(f'"{t}"*' for t in terms if t)
+
+    @staticmethod
+    def _like_pattern(query):
+        # "100%" / "file_name" 이 와일드카드로 해석되지 않도록 (ESCAPE '\')
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escaped}%"
+
+    def search(self, query, limit=50):
+        """
+        text 에 query 단어가 모두 들어 있는 메시지 (최신 순).
+        결과 항목에는 _COLUMNS 외에 snippet ([단어] 강조된 짧은 발췌) 이 붙는다.
+        """
+        query = (query or "").strip()
+        if not query:
+            return []
+
+        columns = ", ".join(f"m.{c}" for c in _COLUMNS)
+        with self._lock:
+            if self.fts:
+                match = self._fts_query(query)
+                if not match:
+                    return []
+                # ORDER BY rowid DESC + LIMIT → 색인을 거꾸로 읽다가 바로 멈춤 (정렬 없음)
+                rows = self.conn.execute(
+                    f"SELECT {columns}, f.snip FROM ("
+                    "    SELECT rowid, snippet(messages_fts, 0, '[', ']', '…', 12) AS snip "
+                    "    FROM messages_fts WHERE messages_fts MATCH ? "
+                    "    ORDER BY rowid DESC LIMIT ?"
+                    ") f JOIN messages m ON m.id = f.rowid ORDER BY m.id DESC",
+                    (match, limit)
+                ).fetchall()
+            else:
+                rows = self.conn.execute(
+                    f"SELECT {columns}, substr(m.text, 1, 80) FROM messages m "
+                    "WHERE m.text LIKE ? ESCAPE '\\' ORDER BY m.id DESC LIMIT ?",
+                    (self._like_pattern(query), limit)
+                ).fetchall()
+
+        results = []
+        for row in rows:
+            entry = dict(zip(_COLUMNS, row[:-1]))
+            entry["snippet"] = row[-1]
+            results.append(entry)
+        return results
+
+    # ------------------------------------------------------
+    # meta
+    # ------------------------------------------------------
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    # ------------------------------------------------------
+    # chat_history.json → SQLite (1회)
+    # ------------------------------------------------------
+    def _migrate_legacy_json(self, legacy_path):
+        if not os.path.exists(legacy_path):
+            return
+        if self._get_meta("legacy_migrated"):
+            return
+
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                history = json.load(f)
+        except Exception as e:
+            log(f"[history_store] legacy load ERROR: {e}")
+            return
+
+        # 예전 load_chat_history 와 같은 순서로 넣어야 id 순서 = 시간 순서
+        history.sort(key=lambda x: (x.get("date", ""), x.get("timestamp", "")))
+
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO messages (role, text, img, timestamp, date) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (e.get("role"), e.get("text"), e.get("img"),
+                     e.get("timestamp"), e.get("date"))
+                    for e in history
+                ]
+            )
+            self._set_meta("legacy_migrated", legacy_path)
+            self.conn.commit()
+
+        try:
+            os.replace(legacy_path, legacy_path + ".migrated")
+        except Exception as e:
+            log(f"[history_store] legacy rename ERROR: {e}")
+
+        log(f"[history_store] migrated {len(history)} messages from {legacy_path}")
+
+    # ------------------------------------------------------
+    # 인라인 base64 이미지 → blob 해시 (1회)
+    # ------------------------------------------------------
+    def _migrate_inline_images(self, batch_size=200):
+        if self._get_meta("inline_images_migrated"):
+            return
+
+        last_id = 0
+        moved = 0
+        failed = 0
+
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT id, img FROM messages "
+                    "WHERE id > ? AND img IS NOT NULL AND img != '' "
+                    "ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for row_id, img in rows:
+                last_id = row_id
+                if all(blob_store.is_blob_hash(h) for h in blob_store.split_hashes(img)):
+                    continue
+                blob_hash = blob_store.put_base64(img)
+                if blob_hash is None:
+                    # 디코딩 / 저장 실패 → 원본(유일한 사본)은 그대로 두고 다음 실행 때 다시 시도
+                    failed += 1
+                    continue
+                updates.append((blob_hash, row_id))
+
+            if updates:
+                with self._lock:
+                    self.conn.executemany(
+                        "UPDATE messages SET img = ? WHERE id = ?", updates
+                    )
+                    self.conn.commit()
+                moved += len(updates)
+
+        if failed:
+            log(f"[history_store] {failed} inline images could not be moved, will retry")
+        else:
+            with self._lock:
+                self._set_meta("inline_images_migrated", "1")
+                self.conn.commit()
+
+        if moved:
+            # 빠진 base64 만큼 파일 공간 회수
+            self.conn.execute("VACUUM")
+            log(f"[history_store] moved {moved} inline images to blobs")
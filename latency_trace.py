@@ -0,0 +1,218 @@
+import os
+import json
+import math
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+from utils import log
+import settings
+
+
+# ----------------------------------------------------------
+# 요청별 지연 시간 기록 (키 입력 → 화면 표시)
+# ----------------------------------------------------------
+# 요청 1개 = Trace 1개. 각 단계가 키 입력 후 몇 ms 에 끝났는지 기록하고
+# 끝나면 storage/trace.jsonl 에 한 줄로 저장 (크기 넘으면 .1 로 돌림).
+#
+# 다른 모듈은 trace 객체를 몰라도 된다:
+#     with latency_trace.active(trace):
+#         ...
+#         latency_trace.mark("grabbed")   # 현재 trace 에 기록 (없으면 무시)
+#         latency_trace.note("request", stats)   # 단계 외 정보도 같은 줄에
+# (contextvars 라 워커 스레드 / asyncio task 마다 따로 유지됨)
+#
+# 설정
+#   trace        : 사용 여부 (기본 true)
+#   trace_max_kb : 로그 파일 최대 크기 (기본 1024)
+
+TRACE_PATH = "storage/trace.jsonl"
+DEFAULT_MAX_KB = 1024
+STATS_WINDOW = 500      # 통계에 쓰는 최근 요청 수
+
+# 단계 (표시 순서)
+STAGES = [
+    "hidden",           # 창 숨김 완료
+    "grabbed",          # 화면 캡처
+    "selected",         # 영역 선택 끝
+    "encoded",          # 변화 감지 + PNG/썸네일/업로드 인코딩
+    "history_saved",    # 사용자 메시지 DB 저장
+    "request_built",    # contents 조립
+    "first_token",
+    "last_token",
+    "rendered",         # 마지막 글자가 화면에 반영
+]
+
+_current = contextvars.ContextVar("latency_trace", default=None)
+_lock = threading.Lock()
+_recent = None          # 최근 기록 deque (처음 통계 요청 때 파일에서 로드)
+_next_id = 0
+
+
+def enabled():
+    return bool(settings.get("trace", True))
+
+
+class Trace:
+
+    def __init__(self, kind):
+        global _next_id
+        with _lock:
+            _next_id += 1
+            self.id = _next_id
+        self.kind = kind
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.stages = {}
+        self.extra = {}
+        self.done = False
+
+    def mark(self, stage):
+        # 같은 단계는 처음 한 번만 (first_token 등)
+        if stage not in self.stages:
+            self.stages[stage] = round((time.perf_counter() - self.t0) * 1000, 1)
+
+    def finish(self, outcome="ok"):
+        if self.done:
+            return
+        self.done = True
+
+        record = {
+            "id": self.id,
+            "kind": self.kind,
+            "start": round(self.started, 3),
+            "outcome": outcome,
+            "total_ms": round((time.perf_counter() - self.t0) * 1000, 1),
+            "stages": self.stages,
+        }
+        record.update(self.extra)
+        _write(record)
+
+
+def start(kind):
+    """키 입력 시점에 호출. 꺼져 있으면 None"""
+    return Trace(kind) if enabled() else None
+
+
+@contextmanager
+def active(trace):
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def mark(stage):
+    trace = _current.get()
+    if trace is not None:
+        trace.mark(stage)
+
+
+def note(key, value):
+    trace = _current.get()
+    if trace is not None:
+        trace.extra[key] = value
+
+
+# ----------------------------------------------------------
+# 저장 (JSONL, 크기 기준으로 한 번 돌림)
+# ----------------------------------------------------------
+def _write(record):
+    with _lock:
+        if _recent is not None:
+            _recent.append(record)
+
+        try:
+            os.makedirs(os.path.dirname(TRACE_PATH), exist_ok=True)
+            max_bytes = int(float(settings.get("trace_max_kb", DEFAULT_MAX_KB)) * 1024)
+            if os.path.exists(TRACE_PATH) and os.path.getsize(TRACE_PATH) > max_bytes:
+                os.replace(TRACE_PATH, TRACE_PATH + ".1")
+
+            with open(TRACE_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            log(f"[latency_trace] write ERROR: {e}")
+
+    log(f"[latency_trace] {record}")
+
+
+def _read_lines(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.readlines()
+    except OSError:
+        return []
+
+
+def recent_records():
+    global _recent
+    with _lock:
+        if _recent is None:
+            lines = _read_lines(TRACE_PATH + ".1") + _read_lines(TRACE_PATH)
+            _recent = deque(maxlen=STATS_WINDOW)
+            for line in lines[-STATS_WINDOW:]:
+                try:
+                    _recent.append(json.loads(line))
+                except ValueError:
+                    continue
+        return list(_recent)
+
+
+# ----------------------------------------------------------
+# 통계 (단계별 소요 시간 p50 / p95)
+# ----------------------------------------------------------
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(0, math.ceil(p / 100 * len(values)) - 1)
+    return values[rank]
+
+
+def stage_durations(record):
+    """각 단계 소요 시간 = 바로 앞 단계(없으면 키 입력)부터의 차이"""
+    durations = {}
+    previous = 0.0
+    # 인코딩이 앞 요청 스트리밍과 겹치는 경우 등 순서가 바뀔 수 있으므로 시간순
+    for stage, at in sorted(record.get("stages", {}).items(), key=lambda item: item[1]):
+        durations[stage] = at - previous
+        previous = at
+    return durations
+
+
+def stage_stats(records=None):
+    """return: [(단계, 건수, p50, p95)] (완료된 요청만)"""
+    if records is None:
+        records = recent_records()
+
+    samples = {stage: [] for stage in STAGES}
+    samples["total"] = []
+    for record in records:
+        if record.get("outcome") != "ok":
+            continue
+        for stage, ms in stage_durations(record).items():
+            samples.setdefault(stage, []).append(ms)
+        samples["total"].append(record.get("total_ms", 0))
+
+    return [
+        (stage, len(values), percentile(values, 50), percentile(values, 95))
+        for stage, values in samples.items() if values
+    ]
+
+
+def format_stats(records=None):
+    rows = stage_stats(records)
+    if not rows:
+        return "No requests recorded yet."
+
+    lines = [f"{'stage':<14}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}"]
+    for stage, count, p50, p95 in rows:
+        lines.append(f"{stage:<14}{count:>5}{p50:>10.0f}{p95:>10.0f}")
+    return "\n".join(lines)
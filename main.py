@@ -1,23 +1,83 @@
+import time
+LAUNCH_T0 = time.perf_counter()   # 창이 뜰 때까지 걸린 시간 측정용
+
 import sys
 import os
 import json
 import os
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
+
+# --------------------------------------------------------
+# 시작 시간 점검용 임시 저장소 (--startup-check)
+# --------------------------------------------------------
+# 빈 기록이 아니라 예전 chat_history.json 이 쌓인 사용자 기준으로 잰다.
+# 키 / 설정만 복사한 임시 폴더에서 실행하므로 실제 기록은 건드리지 않는다.
+STARTUP_CHECK_MESSAGES = 2000
+STARTUP_CHECK_IMAGE_EVERY = 20
+# 1x1 PNG (예전 기록의 인라인 base64 이미지 자리)
+_STARTUP_CHECK_PNG = (
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk"
+    "YPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+
+def use_startup_check_storage():
+    import shutil
+    import tempfile
+
+    root = tempfile.mkdtemp(prefix="acg-startup-")
+    os.makedirs(os.path.join(root, "storage"))
+    for name in ("api_key.json", "settings.json", "system_prompt.txt"):
+        src = os.path.join("storage", name)
+        if os.path.exists(src):
+            shutil.copy(src, os.path.join(root, "storage", name))
+
+    history = []
+    for i in range(STARTUP_CHECK_MESSAGES):
+        history.append({
+            "role": "user" if i % 2 == 0 else "assistant",
+            "text": f"message {i} " + "lorem ipsum dolor sit amet " * 8,
+            "img": _STARTUP_CHECK_PNG if i % STARTUP_CHECK_IMAGE_EVERY == 0 else None,
+            "timestamp": f"{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+            "date": "2024-01-01",
+        })
+    with open(os.path.join(root, "storage", "chat_history.json"), "w", encoding="utf-8") as f:
+        json.dump(history, f)
+
+    os.chdir(root)
+
+
+if "--startup-check" in sys.argv:
+    use_startup_check_storage()
+
 from PySide6.QtWidgets import ( # type: ignore
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QTextEdit, QPushButton, QScrollArea, QDialog,
-    QLineEdit, QSizePolicy
+    QLineEdit, QSizePolicy, QListWidget, QListWidgetItem,
+    QComboBox, QStackedWidget, QInputDialog
 )
 from PySide6.QtCore import Qt, QEvent, QPropertyAnimation
 from PySide6.QtGui import QPixmap, QImage, QTextOption
 
 from Gemini_client import GeminiClient
-from capture_engine import capture_full_screen
+import quota_scheduler
+import sessions
+from sessions import ChatSession
+from chat_view import ChatBubble, StreamingTextSink, THUMB_WIDTH, BURST_THUMB_WIDTH
+from capture_engine import capture
+from tray_mode import GlobalHotkeys, ResidentTray
 from utils import (
-    save_json, load_json, now_timestamp,
-    image_to_base64, base64_to_image
+    save_json, load_json, now_timestamp
 )
+import blob_store
+import thumbnail_cache
+import payload_cache
+import settings
+import latency_trace
+from encode_pipeline import prepare_capture
+import burst_capture
+from burst_capture import BurstSession, BurstTray
 import ctypes
 from ctypes import wintypes
 
@@ -66,10 +126,6 @@ def today_str():
     from datetime import datetime
     return datetime.now().strftime("%Y-%m-%d")
 
-def format_date(date_str):
-    y, m, d = date_str.split("-")
-    return f"{y}-{m}-{d}"
-
 #--------------------------
 # 이미지 붙여넣기 기능
 #--------------------------
@@ -152,95 +208,101 @@ class SystemPromptDialog(QDialog):
         self.accept()  # 창 닫기
 
 
-# --------------------------------------------------------
-# 날짜 구분선
-# --------------------------------------------------------
-class DateSeparator(QWidget):
-    def __init__(self, date_text):
-        super().__init__()
-        layout = QHBoxLayout()
-        layout.setContentsMargins(0, 10, 0, 10)
+#----------------------------------
+#        대화 검색 (Ctrl+F)
+#----------------------------------
+class SearchDialog(QDialog):
+    RESULT_LIMIT = 100
+
+    def __init__(self, history_store, on_jump, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Search history")
+        self.resize(360, 420)
 
-        l1 = QLabel("──────────")
-        l2 = QLabel(f"  {date_text}  ")
-        l3 = QLabel("──────────")
+        self.history_store = history_store
+        self.on_jump = on_jump
 
-        for l in (l1, l2, l3):
-            l.setStyleSheet("color:#555; font-size:12px;")
+        layout = QVBoxLayout()
+
+        self.edit = QLineEdit()
+        self.edit.setPlaceholderText("Search messages…")
+        self.edit.textChanged.connect(self.schedule_search)
+        self.edit.returnPressed.connect(self.jump_to_first)
+        layout.addWidget(self.edit)
+
+        self.results = QListWidget()
+        self.results.setWordWrap(True)
+        self.results.itemActivated.connect(self.jump_to_item)
+        self.results.itemClicked.connect(self.jump_to_item)
+        layout.addWidget(self.results)
 
-        layout.addWidget(l1)
-        layout.addWidget(l2)
-        layout.addWidget(l3)
         self.setLayout(layout)
 
+        # 입력이 멈추면 검색 (한 글자마다 쿼리하지 않음)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(120)
+        self._timer.timeout.connect(self.run_search)
+
+    def open(self):
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.edit.setFocus()
+        self.edit.selectAll()
+
+    def schedule_search(self):
+        self._timer.start()
+
+    def run_search(self):
+        self.results.clear()
+        for entry in self.history_store.search(self.edit.text(), self.RESULT_LIMIT):
+            who = "You" if entry["role"] == "user" else "Gemini"
+            snippet = (entry["snippet"] or "").replace("\n", " ")
+            item = QListWidgetItem(f"{entry['date']} {who}: {snippet}")
+            item.setData(Qt.UserRole, entry["id"])
+            self.results.addItem(item)
+
+    def jump_to_first(self):
+        self._timer.stop()
+        self.run_search()
+        if self.results.count():
+            self.jump_to_item(self.results.item(0))
+
+    def jump_to_item(self, item):
+        self.on_jump(item.data(Qt.UserRole))
 
-# --------------------------------------------------------
-# 말풍선
-# --------------------------------------------------------
-class ChatBubble(QWidget):
-    def __init__(self, text="", is_user=False, image_b64=None, timestamp=""):
+
+#----------------------------------
+#        지연 시간 통계 (Ctrl+T)
+#----------------------------------
+class LatencyStatsDialog(QDialog):
+    def __init__(self):
         super().__init__()
+        self.setWindowTitle("Latency (recent requests)")
+        self.resize(380, 320)
 
-        outer = QVBoxLayout()
-        outer.setContentsMargins(0, 0, 0, 0)
-        outer.setSpacing(3)
-
-        bubble = QWidget()
-        bubble_layout = QVBoxLayout()
-        bubble_layout.setContentsMargins(10, 10, 10, 10)
-        bubble_layout.setSpacing(6)
-
-        # ----- 텍스트 영역 -----
-        self.text_label = QLabel()   # ← ★★★★★ 핵심
-        self.text_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
-        self.text_label.setWordWrap(True)
-        self.text_label.setStyleSheet("""
-            QLabel {
-                font-size: 13px;
-                color: black;
-                background: transparent;
-            }
-        """)
-        self.text_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
-        self.text_label.setMaximumWidth(260)
-        self.text_label.setText(text or "")
-        bubble_layout.addWidget(self.text_label)
-
-        # ----- 이미지 영역 -----
-        if image_b64:
-            img = base64_to_image(image_b64)
-            qimg = QImage(img.tobytes(), img.width, img.height, QImage.Format_RGB888)
-            pix = QPixmap.fromImage(qimg).scaledToWidth(180, Qt.SmoothTransformation)
-            img_lbl = QLabel()
-            img_lbl.setPixmap(pix)
-            img_lbl.setStyleSheet("background: transparent;")
-            bubble_layout.addWidget(img_lbl)
-
-        bubble.setLayout(bubble_layout)
-
-        wrap = QHBoxLayout()
-        wrap.setContentsMargins(0, 0, 0, 0)
-        wrap.setSpacing(0)
-
-        if is_user:
-            bubble.setStyleSheet("background:#ffe97a; border-radius:12px; border-bottom-right-radius:4px;")
-            wrap.addStretch()
-            wrap.addWidget(bubble)
-        else:
-            bubble.setStyleSheet("background:#aee3ff; border-radius:12px; border-bottom-left-radius:4px;")
-            wrap.addWidget(bubble)
-            wrap.addStretch()
+        layout = QVBoxLayout()
 
-        outer.addLayout(wrap)
+        self.label = QLabel()
+        self.label.setStyleSheet("font-family: Consolas, monospace;")
+        self.label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.label)
 
-        ts = QLabel(timestamp)
-        ts.setStyleSheet("font-size:11px; color:#aaa; padding-left:4px; padding-right:4px;")
-        ts.setAlignment(Qt.AlignRight if is_user else Qt.AlignLeft)
+        btn = QPushButton("Refresh")
+        btn.clicked.connect(self.refresh)
+        layout.addWidget(btn)
 
-        outer.addSpacing(2)
-        outer.addWidget(ts)
+        self.setLayout(layout)
+        self.refresh()
+
+    def refresh(self):
+        self.label.setText(
+            latency_trace.format_stats()
+            + "\n\nEach stage = time since the previous stage."
+            + f"\nLog: {latency_trace.TRACE_PATH}"
+        )
 
-        self.setLayout(outer)
 
 # --------------------------------------------------------
 # 메인 윈도우
@@ -249,9 +311,27 @@ class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
 
-        self.Gemini = GeminiClient()
+        # SDK import + 연결은 창이 뜬 다음 백그라운드에서
+        self.Gemini = GeminiClient(connect=False)
+        QTimer.singleShot(0, self.Gemini.connect_in_background)
+
+        # 이름 붙은 대화 세션 (기록 / 워커 / 화면은 세션마다, 연결과 한도는 공유)
+        # 목록만 만들어 두고 내용은 처음 열 때 로드
+        self.sessions = {}
+        for name, folder in sessions.list_sessions():
+            self.sessions[name] = ChatSession(name, folder, self.Gemini, self)
+        self.session = None
+        self.search_dialog = None
+
+        # 연속 캡처 대기열 (Ctrl+B 로 쌓고 다음 전송 때 한 요청으로)
+        self.burst = BurstSession(BURST_THUMB_WIDTH)
+        self.burst.staged.connect(self.on_burst_staged)
+        self.burst.skipped.connect(self.on_status)
 
         self.setWindowTitle("AutoCaptureGemini")
+        self.on_status(
+            f"{quota_scheduler.remaining_today()}/{quota_scheduler.rpd()} requests left today"
+        )
         self.resize(360, 600)
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.setStyleSheet("background:black;")
@@ -269,69 +349,29 @@ class MainWindow(QWidget):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(10, 10, 10, 10)
 
-        # 대화 기록 파일
-        self.history_path = "storage/chat_history.json"
+        # 대화 기록 저장소 (예전 chat_history.json 은 자동 이전)
         if not os.path.exists("storage"):
             os.makedirs("storage")
 
-        
         # --------------------------------------------------------
-        # 스크롤 영역
+        # 세션 선택 (Ctrl+N 새 세션 / Ctrl+Tab 다음 세션)
         # --------------------------------------------------------
-        self.scroll = QScrollArea()  # ★ 반드시 있어야 함
-        self.scroll.setWidgetResizable(True)
-        self.scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-
-        # 스크롤바 스타일
-        self.scroll.setStyleSheet("""
-            QScrollBar:vertical {
-                width: 10px;              /* ★ 스크롤바 두께 증가 */
-                background: transparent;
-                margin: 0px;
-            }
-
-            QScrollBar::handle:vertical {
-                background: #333333;      /* ★ 어두운 회색으로 변경 */
-                border-radius: 4px;       /* 살짝 더 둥글게 */
-                min-height: 20px;
-            }
-
-            QScrollBar::handle:vertical:hover {
-                background: #999999;      /* hover 시 더 진하게 */
-            }
-
-            QScrollBar::add-line:vertical,
-            QScrollBar::sub-line:vertical {
-                height: 0px;
-                background: transparent;
-            }
-
-            QScrollBar::add-page:vertical,
-            QScrollBar::sub-page:vertical {
-                background: transparent;
-            }
-        """)
-
-        # 채팅 컨테이너
-        self.chat_container = QWidget()
-        self.chat_container.setStyleSheet("background-color: black;")
-
-        self.chat_container.setSizePolicy(
-            QSizePolicy.Expanding,
-            QSizePolicy.MinimumExpanding        # 또는 MinimumExpanding도 가능
+        self.session_box = QComboBox()
+        self.session_box.setStyleSheet("color:white; background:#222; padding:2px 6px;")
+        self.session_box.activated.connect(
+            lambda index: self.switch_session(self.session_box.itemData(index))
         )
+        self.session_box.setVisible(len(self.sessions) > 1)
+        layout.addWidget(self.session_box)
 
+        # --------------------------------------------------------
+        # 채팅 영역 (세션마다 ChatView 하나, 최근 페이지만 먼저 로드)
+        # --------------------------------------------------------
+        self.chat_stack = QStackedWidget()
+        layout.addWidget(self.chat_stack)
 
-        self.chat_layout = QVBoxLayout()
-        self.chat_layout.setAlignment(Qt.AlignTop)
-
-        # 여기에 추가!!
-        self.chat_layout.setSpacing(12)
-
-        self.chat_container.setLayout(self.chat_layout)
-        self.scroll.setWidget(self.chat_container)
-
-        layout.addWidget(self.scroll)
+        start = sessions.last_active()
+        self.switch_session(start if start in self.sessions else sessions.DEFAULT_SESSION, load=False)
 
         # --------------------------------------------------------
         # 입력창 + 버튼
@@ -365,6 +405,7 @@ class MainWindow(QWidget):
         """)
 
         self.input.textChanged.connect(self.adjust_input_area)
+        self.input.textChanged.connect(self.prewarm_connection)
         self.input.installEventFilter(self)
 
         self.send_btn = QPushButton("➤")
@@ -389,22 +430,33 @@ class MainWindow(QWidget):
             }
         """)
 
-        self.send_btn.clicked.connect(self.send_with_capture)
+        self.send_btn.clicked.connect(lambda: self.send_with_capture())
 
         input_layout.addWidget(self.input)
         input_layout.addWidget(self.send_btn)
+
+        # 쌓아 둔 연속 캡처 (비어 있으면 숨김)
+        self.burst_tray = BurstTray(self.clear_burst)
+        layout.addWidget(self.burst_tray)
         layout.addLayout(input_layout)
 
-        # 대화 불러오기
-        self.load_chat_history()
+        # 대화 불러오기 (창을 먼저 그린 뒤, 예전 기록 이전 / 색인도 그때)
+        self.shown_at = None
+        self.history_ready_at = None
+        QTimer.singleShot(0, self.open_history)
+
+        # 상주 모드 (트레이 + 전역 단축키)
+        self.tray = None
+        self.hotkeys = None
+        self.quitting = False
+        if settings.get("tray_mode", False):
+            self.start_tray_mode()
 
 
 
     #붙여넣기 이미지 처리 함수
 
     def handle_paste_image(self, qimage):
-        from utils import image_to_base64
-
         # QImage → bytes 변환
         qimage = qimage.convertToFormat(QImage.Format_RGBA8888)
         width = qimage.width()
@@ -414,14 +466,17 @@ class MainWindow(QWidget):
         # bytes → PIL.Image
         pil_img = Image.frombytes("RGBA", (width, height), bytes_data)
 
-        img_b64 = image_to_base64(pil_img)
+        img_hash = blob_store.put_image(pil_img)
+        if img_hash:
+            thumbnail_cache.save_thumbnail(img_hash, pil_img, THUMB_WIDTH)
+            payload_cache.build_payload(img_hash, pil_img)
 
         # 붙여넣기 시 입력창에 안내 표시
         # self.input.setPlainText("(이미지 붙여넣기)")
 
         # 버블로 추가
-        self.add_user_bubble("", img_b64)
-        self.save_chat_history("user", "", img_b64)
+        self.add_user_bubble("", img_hash)
+        self.save_chat_history("user", "", img_hash)
 
     # 입력창 자동 높이
     def adjust_input_area(self):
@@ -433,62 +488,102 @@ class MainWindow(QWidget):
 
     # 날짜 구분선
     def add_date_separator_if_needed(self, date_str):
-        if not hasattr(self, "last_date"):
-            self.last_date = None
-
-        if self.last_date != date_str:
-            sep = DateSeparator(format_date(date_str))
-            self.chat_layout.addWidget(sep)
-            self.last_date = date_str
-
-    # 대화 기록 저장
-    def save_chat_history(self, role, text, img_b64):
-        history = []
-        if os.path.exists(self.history_path):
-            try:
-                with open(self.history_path, "r", encoding="utf-8") as f:
-                    history = json.load(f)
-            except:
-                history = []
-
-        entry = {
-            "role": role,
-            "text": text,
-            "img": img_b64,
-            "timestamp": now_timestamp(),
-            "date": today_str()
-        }
-        history.append(entry)
-
-        with open(self.history_path, "w", encoding="utf-8") as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
-
-    # 대화 불러오기
-    
-    def load_chat_history(self):
-        if not os.path.exists(self.history_path):
-            return
+        self.chat_view.add_date_separator_if_needed(date_str)
 
-        try:
-            with open(self.history_path, "r", encoding="utf-8") as f:
-                history = json.load(f)
-        except:
+    # 대화 기록 저장 (한 줄 INSERT, session 없으면 현재 세션)
+    def save_chat_history(self, role, text, img_hash, session=None):
+        (session or self.session).history_store.append(
+            role, text, img_hash, now_timestamp(), today_str()
+        )
+
+    # --------------------------------------------------------
+    # 세션
+    # --------------------------------------------------------
+    # 아래 둘은 항상 지금 보이는 세션의 것
+    @property
+    def chat_view(self):
+        return self.session.chat_view
+
+    @property
+    def history_store(self):
+        return self.session.history_store
+
+    @property
+    def worker(self):
+        return self.session.ensure_worker()
+
+    def switch_session(self, name, load=True):
+        session = self.sessions.get(name)
+        if session is None or session is self.session:
             return
 
-        history.sort(key=lambda x: (x["date"], x["timestamp"]))
+        # 처음 여는 세션만 DB / 화면 생성, 이후 전환은 보이는 화면만 바꿈
+        # (load=False : 시작할 때 → 이전 / 색인도 open_history 에서)
+        if session.open_view(defer_migrations=not load):
+            self.chat_stack.addWidget(session.chat_view)
+            if load:
+                session.chat_view.load_initial()
+
+        self.session = session
+        self.chat_stack.setCurrentWidget(session.chat_view)
+        if self.search_dialog is not None:
+            self.search_dialog.history_store = session.history_store
+        sessions.remember_active(name)
+        self.refresh_session_box()
+        self.on_status(
+            f"{quota_scheduler.remaining_today()}/{quota_scheduler.rpd()} requests left today"
+        )
 
-        for entry in history:
-            date = entry["date"]
-            ts = entry["timestamp"]
+    def new_session(self):
+        name, ok = QInputDialog.getText(self, "New session", "Session name:")
+        name = name.strip()
+        if not ok or not name:
+            return
 
-            self.add_date_separator_if_needed(date)
+        folder = sessions.create_session_folder(name)
+        if folder is None:
+            self.on_status(f"A session named {name} already exists")
+            return
 
-            if entry["role"] == "user":
-                bubble = ChatBubble(entry["text"], True, entry.get("img"), ts)
-            else:
-                bubble = ChatBubble(entry["text"], False, None, ts)
+        self.sessions[name] = ChatSession(name, folder, self.Gemini, self)
+        self.session_box.setVisible(True)
+        self.switch_session(name)
+
+    def cycle_session(self, step):
+        names = list(self.sessions)
+        index = names.index(self.session.name)
+        self.switch_session(names[(index + step) % len(names)])
+
+    def refresh_session_box(self):
+        # 다른 세션에서 답을 받는 중이면 ● 표시
+        self.session_box.clear()
+        for name, session in self.sessions.items():
+            mark = " ●" if session is not self.session and session.is_streaming() else ""
+            self.session_box.addItem(name + mark, name)
+        self.session_box.setCurrentIndex(list(self.sessions).index(self.session.name))
+
+    # 창이 뜬 뒤 첫 차례: 예전 기록 이전 / 색인 (처음 한 번만 오래 걸림) → 최근 페이지
+    def open_history(self):
+        self.shown_at = time.perf_counter()
+        store = self.session.history_store
+        if store.needs_migration():
+            self.on_status("Migrating history…")
+            QApplication.processEvents()   # 안내를 먼저 그림
+            store.migrate()
+            self.on_status(
+                f"{quota_scheduler.remaining_today()}/{quota_scheduler.rpd()} requests left today"
+            )
+        else:
+            store.migrate()   # 이미 끝났으면 검색 색인 확인만 (금방)
+        self.load_chat_history()
+        self.history_ready_at = time.perf_counter()
 
-            self.chat_layout.addWidget(bubble)
+    # 대화 불러오기 (최근 페이지)
+    def load_chat_history(self):
+        try:
+            self.chat_view.load_initial()
+        except Exception:
+            return
 
     # 엔터키 처리
     def eventFilter(self, obj, event):
@@ -500,6 +595,47 @@ class MainWindow(QWidget):
                 dlg.exec()
                 return True
 
+            # ★ Ctrl + F : 대화 검색
+            if event.key() == Qt.Key_F and (event.modifiers() & Qt.ControlModifier):
+                self.open_search()
+                return True
+
+            # ★ Ctrl + T : 단계별 지연 시간 통계
+            if event.key() == Qt.Key_T and (event.modifiers() & Qt.ControlModifier):
+                LatencyStatsDialog().exec()
+                return True
+
+            # ★ Ctrl + N : 새 세션 / Ctrl + Tab : 다음 세션 (Shift 는 이전)
+            if event.key() == Qt.Key_N and (event.modifiers() & Qt.ControlModifier):
+                self.new_session()
+                return True
+
+            if event.key() in (Qt.Key_Tab, Qt.Key_Backtab) and (event.modifiers() & Qt.ControlModifier):
+                self.cycle_session(-1 if event.key() == Qt.Key_Backtab else 1)
+                return True
+
+            # ★ Ctrl + B : 지금 화면을 연속 캡처 대기열에 추가
+            if event.key() == Qt.Key_B and (event.modifiers() & Qt.ControlModifier):
+                self.stage_burst_frame()
+                return True
+
+            # ★ 캡처 범위 단축키
+            #   Ctrl+R 영역 선택 / Ctrl+W 직전 활성 창 / Ctrl+M 마우스가 있는 모니터
+            if event.modifiers() & Qt.ControlModifier:
+                mode = {
+                    Qt.Key_R: "region",
+                    Qt.Key_W: "window",
+                    Qt.Key_M: "monitor",
+                }.get(event.key())
+                if mode:
+                    self.send_with_capture(mode)
+                    return True
+
+            # ★ Esc : 진행 중인 응답 취소
+            if event.key() == Qt.Key_Escape and self.session.is_busy():
+                self.worker.cancel()
+                return True
+
             # ★ 엔터키 처리만 input에 한정
             if obj == self.input:
                 if event.key() == Qt.Key_Return:
@@ -518,25 +654,21 @@ class MainWindow(QWidget):
 
     # 스크롤 맨 아래로
     def scroll_bottom(self):
-        QApplication.processEvents()
-        self.scroll.verticalScrollBar().setValue(
-            self.scroll.verticalScrollBar().maximum()
-        )
+        self.chat_view.scroll_bottom()
 
     # 말풍선
-    def add_user_bubble(self, text, img_b64=None):
+    def add_user_bubble(self, text, img_hash=None):
         date = today_str()               # 메시지의 실제 날짜(저장용)
-        self.add_date_separator_if_needed(date)
-        bubble = ChatBubble(text, True, img_b64, now_timestamp())
-        self.chat_layout.addWidget(bubble)
+        bubble = ChatBubble(text, True, img_hash, now_timestamp())
+        self.chat_view.add_widget(bubble, date)
 
         QTimer.singleShot(0, self.scroll_bottom)
+        return bubble
 
 
     def add_Gemini_bubble(self, text, date):
-        self.add_date_separator_if_needed(date)
         bubble = ChatBubble(text, False, None, now_timestamp())
-        self.chat_layout.addWidget(bubble)
+        self.chat_view.add_widget(bubble, date)
         QTimer.singleShot(0, self.scroll_bottom)
 
     # Gemini typing 표시
@@ -548,7 +680,7 @@ class MainWindow(QWidget):
             padding:10px;
             border-radius:10px;
         """)
-        self.chat_layout.addWidget(self.typing)
+        self.chat_view.add_widget(self.typing)
         self.scroll_bottom()
 
     def remove_typing(self):
@@ -564,74 +696,386 @@ class MainWindow(QWidget):
         self.input.clear()
         self.adjust_input_area()
 
+        # 아직 대기 중인 텍스트 요청이 있으면 거기에 합침 (요청 1번 절약)
+        if self.session.last_text_request:
+            req_id, Gemini_bubble = self.session.last_text_request
+            if req_id in self.session.streams and self.worker.try_append_text(req_id, text):
+                bubble = ChatBubble(text, True, None, now_timestamp())
+                self.chat_view.insert_before(bubble, Gemini_bubble)
+                self.save_chat_history("user", text, None)
+                return
+
+        trace = latency_trace.start("text")
+
         # 사용자 말풍선 추가
         self.add_user_bubble(text)
         self.save_chat_history("user", text, None)
+        if trace:
+            trace.mark("history_saved")
 
         # ★ Gemini 말풍선을 빈 상태로 먼저 생성
         Gemini_bubble = ChatBubble("", False, None, now_timestamp())
-        self.chat_layout.addWidget(Gemini_bubble)
+        self.chat_view.add_widget(Gemini_bubble)
         self.scroll_bottom()
 
-        # ★ 스트리밍 콜백 (Gemini가 글자 보낼 때마다 실행됨)
-        def on_delta(text_chunk):
-            current = Gemini_bubble.text_label.text()
-            Gemini_bubble.text_label.setText(current + text_chunk)
-            self.scroll_bottom()
+        # ★ Gemini 스트리밍 호출 (워커 스레드)
+        req_id = self.worker.submit(text, trace=trace)
+        self.session.streams[req_id] = StreamingTextSink(Gemini_bubble.text_label, self)
+        self.session.traces[req_id] = trace
+        self.session.last_text_request = (req_id, Gemini_bubble)
 
-        # ★ Gemini 스트리밍 호출
-        res = self.Gemini.send_message(text, on_delta=on_delta)
 
-        # 대화 저장
-        self.save_chat_history("assistant", full_text, None)
+    # 캡처 포함 전송 (mode: full / region / window / monitor)
+    def send_with_capture(self, mode="full"):
+        # 쌓아 둔 연속 캡처가 있으면 새로 찍지 않고 그것들을 보냄
+        if self.burst.count():
+            self.send_burst()
+            return
 
+        trace = latency_trace.start(mode)
 
-    # 캡처 포함 전송
-    def send_with_capture(self):
         text = self.input.toPlainText().strip()
         self.input.clear()
         self.adjust_input_area()
 
-        img = capture_full_screen(
-            hide=lambda: self.hide(),
-            show=lambda: self.show()
-        )
-        img_b64 = image_to_base64(img)
+        # 트레이에 숨어 있을 때는 숨기기/보이기 없이 바로 캡처
+        resident = not self.isVisible()
+        with latency_trace.active(trace):
+            if resident:
+                img = capture(mode)
+            else:
+                img = capture(
+                    mode,
+                    hide=lambda: self.hide(),
+                    show=lambda: self.show(),
+                    window=self
+                )
+
+        # 영역 선택 취소 → 입력 내용 복구
+        if img is None and mode == "region":
+            self.input.setPlainText(text)
+            return
 
-        # 사용자 말풍선
-        self.add_user_bubble(text, img_b64)
-        self.save_chat_history("user", text, img_b64)
+        # 사용자 말풍선 (이미지는 워커에서 인코딩이 끝나면 붙임)
+        user_bubble = self.add_user_bubble(text)
 
         # ★ Gemini 말풍선을 비어 있는 상태로 먼저 생성
         Gemini_bubble = ChatBubble("", False, None, now_timestamp())
-        self.chat_layout.addWidget(Gemini_bubble)
+        self.chat_view.add_widget(Gemini_bubble)
         self.scroll_bottom()
 
-        # ★ 스트리밍 콜백
-        full_text = ""   # 스트리밍 전체 내용 저장용 변수
+        # ★ 변화 감지 + 인코딩 + Gemini 스트리밍 (모두 워커 스레드)
+        prepare = None
+        if img is not None:
+            detector = self.session.change_detector
+            prepare = lambda: prepare_capture(img, text, mode, detector, THUMB_WIDTH)
+        else:
+            self.save_chat_history("user", text, None)
+            if trace:
+                trace.mark("history_saved")
+
+        req_id = self.worker.submit(text, prepare=prepare, trace=trace)
+        self.session.streams[req_id] = StreamingTextSink(Gemini_bubble.text_label, self)
+        self.session.traces[req_id] = trace
+        if prepare is not None:
+            self.session.pending_user[req_id] = (user_bubble, text)
+
+        # 답변이 보이도록 창을 띄우되 포커스는 뺏지 않음
+        if resident:
+            self.show_without_focus()
+
+    # --------------------------------------------------------
+    # 연속 캡처
+    # --------------------------------------------------------
+    def stage_burst_frame(self, mode="full"):
+        if self.burst.count() >= burst_capture.max_frames():
+            self.on_status(f"Burst is full ({burst_capture.max_frames()} frames), press Enter to send")
+            return
 
-        def on_delta(text_chunk):
-            nonlocal full_text
-            if not text_chunk:   # None 또는 "" 모두 무시
-                return
-            full_text += text_chunk
+        resident = not self.isVisible()
+        if resident:
+            img = capture(mode)
+        else:
+            img = capture(mode, hide=lambda: self.hide(), show=lambda: self.show(), window=self)
+        if img is None:
+            return
 
-            current = Gemini_bubble.text_label.text()
-            Gemini_bubble.text_label.setText(current + text_chunk)
-            self.scroll_bottom()
+        # 축소 / 중복 확인 / 인코딩은 burst 스레드에서 (끝나면 staged signal)
+        self.burst.add(img)
 
-        # ★ Gemini 스트리밍 호출
-        res = self.Gemini.send_message(text, img_b64, on_delta=on_delta)
+    def on_burst_staged(self, generation, image_hash):
+        # ✕ / 전송으로 비운 묶음에서 인코딩이 늦게 끝난 장은 무시
+        if generation != self.burst.generation():
+            return
+
+        self.burst_tray.add_frame(image_hash, BURST_THUMB_WIDTH)
+        count = self.burst_tray.count
+        self.on_status(f"{count} screenshot(s) staged")
+        if self.tray is not None:
+            self.tray.icon.setToolTip(f"AutoCaptureGemini — {count} staged")
+
+    def clear_burst(self):
+        self.burst.clear()
+        self.burst_tray.clear()
+        if self.tray is not None:
+            self.tray.icon.setToolTip("AutoCaptureGemini")
+
+    def send_burst(self):
+        trace = latency_trace.start("burst")
+
+        text = self.input.toPlainText().strip()
+        self.input.clear()
+        self.adjust_input_area()
+
+        batch = self.burst.take()
+        self.clear_burst()
+        resident = not self.isVisible()
+
+        user_bubble = self.add_user_bubble(text)
+        Gemini_bubble = ChatBubble("", False, None, now_timestamp())
+        self.chat_view.add_widget(Gemini_bubble)
+        self.scroll_bottom()
+
+        # 여러 장을 보냈으므로 다음 단일 캡처는 전체 화면부터 다시 비교
+        self.session.change_detector.reset()
+
+        prepare = lambda: burst_capture.collect(batch, text)
+        req_id = self.worker.submit(text, prepare=prepare, trace=trace)
+        self.session.streams[req_id] = StreamingTextSink(Gemini_bubble.text_label, self)
+        self.session.traces[req_id] = trace
+        self.session.pending_user[req_id] = (user_bubble, text)
+
+        if resident:
+            self.show_without_focus()
+
+    # --------------------------------------------------------
+    # 검색
+    # --------------------------------------------------------
+    def open_search(self):
+        if self.search_dialog is None:
+            self.search_dialog = SearchDialog(self.history_store, self.jump_to_message, self)
+        self.search_dialog.open()
+
+    def jump_to_message(self, message_id):
+        # 답변을 받는 중에는 화면을 갈아끼우지 않음 (말풍선이 사라지므로)
+        busy = bool(self.session.streams or self.session.pending_user)
+        if not self.chat_view.jump_to(message_id, allow_reload=not busy):
+            self.on_status("Wait for the answer to finish to jump to older messages")
+
+    # --------------------------------------------------------
+    # 상주 모드
+    # --------------------------------------------------------
+    def start_tray_mode(self):
+        self.tray = ResidentTray(self, self.windowIcon())
+        self.hotkeys = GlobalHotkeys()
+        self.hotkeys.activated.connect(self.on_hotkey)
+        self.hotkeys.start()
+
+    def on_hotkey(self, action):
+        if action == "toggle":
+            self.toggle_window()
+        elif action == "burst":
+            self.stage_burst_frame()
+        else:
+            self.send_with_capture(action)
+
+    def toggle_window(self):
+        if self.isVisible():
+            self.hide()
+        else:
+            self.show()
+            self.raise_()
+            self.activateWindow()
+            self.input.setFocus()
+
+    def show_without_focus(self):
+        self.setAttribute(Qt.WA_ShowWithoutActivating, True)
+        self.show()
+        self.setAttribute(Qt.WA_ShowWithoutActivating, False)
+
+    def quit_app(self):
+        self.quitting = True
+        self.close()
+        QApplication.instance().quit()
+
+    # --------------------------------------------------------
+    # 워커 signal 처리 (GUI 스레드)
+    # --------------------------------------------------------
+    def prewarm_connection(self):
+        # 입력하는 동안 끊긴 연결을 미리 다시 열어 둔다
+        if settings.get("prewarm", True):
+            self.Gemini.warm_if_idle()
+
+    def on_status(self, message, session=None):
+        # 세션이 여러 개면 제목에 안내를 보낸 세션 이름 (없으면 지금 보이는 세션)
+        session = session or self.session
+        if session is not None and len(self.sessions) > 1:
+            message = f"[{session.name}] {message}"
+        self.setWindowTitle(f"AutoCaptureGemini — {message}")
+
+    def on_capture_prepared(self, session, req_id, prepared):
+        pending = session.pending_user.pop(req_id, None)
+        if pending is None:
+            return
+
+        bubble, text = pending
+        if prepared.change is not None:
+            session.sent_captures[req_id] = prepared
+        if prepared.display_hash:
+            session.chat_view.attach_image(bubble, prepared.display_hash)
+        self.save_chat_history("user", text, prepared.display_hash, session)
+
+        trace = session.traces.get(req_id)
+        if trace:
+            trace.mark("history_saved")
+            trace.extra["encode"] = prepared.timings
+
+        ocr = prepared.timings.get("ocr")
+        if ocr:
+            self.on_status(
+                f"Sent screen text instead of the screenshot "
+                f"(saved {ocr['saved_bytes'] / 1024:.0f} KB, ~{ocr['saved_tokens']} tokens)"
+            )
+
+    def _save_pending_user(self, session, req_id):
+        # 인코딩 전에 실패/취소된 경우에도 사용자 메시지는 남긴다
+        pending = session.pending_user.pop(req_id, None)
+        if pending is not None:
+            self.save_chat_history("user", pending[1], None, session)
+
+    def on_stream_delta(self, session, req_id, text_chunk):
+        sink = session.streams.get(req_id)
+        if sink is not None:
+            sink.append(text_chunk)   # None 또는 "" 는 무시됨
+
+    def _finish_trace(self, session, req_id, outcome):
+        trace = session.traces.pop(req_id, None)
+        if trace:
+            if outcome == "ok":
+                trace.mark("rendered")
+            trace.finish(outcome)
+
+    def on_stream_finished(self, session, req_id, full_text):
+        # 모델이 실제로 본 화면만 다음 crop 의 기준이 된다
+        prepared = session.sent_captures.pop(req_id, None)
+        if prepared is not None:
+            session.change_detector.commit(prepared.change, prepared.display_hash)
+
+        sink = session.streams.pop(req_id, None)
+        if sink is None:
+            return
+        self.refresh_session_box()
+        sink.finish(full_text)
 
         # 전체 결과 저장
-        self.save_chat_history("assistant", full_text, None)
+        self.save_chat_history("assistant", full_text, None, session)
+
+        # 다음 이벤트 루프 차례 = 마지막 글자가 그려진 뒤
+        QTimer.singleShot(0, lambda: self._finish_trace(session, req_id, "ok"))
+
+    def on_stream_failed(self, session, req_id, message):
+        session.sent_captures.pop(req_id, None)
+        self._save_pending_user(session, req_id)
+        self._finish_trace(session, req_id, "error")
+        sink = session.streams.pop(req_id, None)
+        if sink is None:
+            return
+        self.refresh_session_box()
+        sink.finish(f"[Error] {message}")
+
+    def on_stream_cancelled(self, session, req_id, partial_text):
+        session.sent_captures.pop(req_id, None)
+        self._save_pending_user(session, req_id)
+        self._finish_trace(session, req_id, "cancelled")
+        sink = session.streams.pop(req_id, None)
+        if sink is None:
+            return
+        self.refresh_session_box()
+
+        # 받은 부분까지만 저장
+        if partial_text:
+            sink.finish(partial_text + " …")
+            self.save_chat_history("assistant", partial_text, None, session)
+        else:
+            sink.finish("(cancelled)")
+
+    def closeEvent(self, event):
+        # 상주 모드: 닫기 = 트레이로 숨기기
+        if self.tray is not None and not self.quitting:
+            event.ignore()
+            self.hide()
+            return
 
+        if self.hotkeys is not None:
+            self.hotkeys.stop()
+        if self.tray is not None:
+            self.tray.hide()
+        for session in self.sessions.values():
+            session.close()
+        super().closeEvent(event)
 
 
 
+
+# --------------------------------------------------------
+# 시작 시간 점검
+# --------------------------------------------------------
+#   python main.py --startup-check : 창이 뜰 때까지 걸린 시간 출력 후 종료
+#                                    (startup_budget_ms 초과 시 exit code 1)
+#                                    예전 기록이 쌓인 임시 저장소에서 실행 (위 참고)
+#   python main.py --importtime    : 위 점검을 -X importtime 으로 실행해서
+#                                    import 가 느린 모듈 순으로 출력
+DEFAULT_STARTUP_BUDGET_MS = 500
+
+
+def report_time_to_window():
+    # 창이 뜬 시점 = open_history 가 시작된 첫 이벤트 루프 차례 (이전은 그 뒤)
+    if win.history_ready_at is None:
+        QTimer.singleShot(10, report_time_to_window)
+        return
+
+    elapsed = (win.shown_at - LAUNCH_T0) * 1000
+    budget = float(settings.get("startup_budget_ms", DEFAULT_STARTUP_BUDGET_MS))
+    ok = elapsed <= budget
+    print(f"time to window: {elapsed:.0f} ms (budget {budget:.0f} ms) {'OK' if ok else 'SLOW'}")
+    print(f"history ready: {(win.history_ready_at - LAUNCH_T0) * 1000:.0f} ms "
+          f"({STARTUP_CHECK_MESSAGES} legacy messages migrated)")
+    QApplication.instance().exit(0 if ok else 1)
+
+
+def import_time_report(top=25):
+    import subprocess
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--startup-check"],
+        capture_output=True, text=True
+    )
+
+    # "import time: self [us] | cumulative | imported package"
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+        except ValueError:
+            continue
+
+    rows.sort(reverse=True)
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative_us, self_us, name in rows[:top]:
+        print(f"{cumulative_us / 1000:10.1f}ms {self_us / 1000:8.1f}ms  {name}")
+    print(proc.stdout.strip())
+    return proc.returncode
+
+
 # --------------------------------------------------------
 # 실행
 # --------------------------------------------------------
+if "--importtime" in sys.argv:
+    sys.exit(import_time_report())
+
 if not os.path.exists("storage"):
     os.makedirs("storage")
 
@@ -650,6 +1094,9 @@ if not key or "api_key" not in key:
 win = MainWindow()
 win.show()
 
+if "--startup-check" in sys.argv:
+    QTimer.singleShot(0, report_time_to_window)
+
 sys.exit(app.exec())
 
 
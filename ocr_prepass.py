@@ -0,0 +1,223 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from utils import log
+import blob_store
+import payload_cache
+import settings
+from context_builder import estimate_text_tokens, estimate_size_tokens
+
+
+# ----------------------------------------------------------
+# 로컬 OCR 사전 처리 (글자 위주 화면은 픽셀 대신 텍스트로)
+# ----------------------------------------------------------
+# 코드 편집기 / 터미널 / 문서 화면은 큰 이미지 대신 화면 글자를 보내는 편이
+# 훨씬 작고 싸다. 캡처 인코딩과 동시에 OCR 을 돌려서 신뢰도가 충분하면
+#   보낼 내용 = 질문 + [화면 텍스트] (+ 작은 미리보기 이미지)
+# 로 바꾸고, 절약한 바이트 / 토큰을 timings["ocr"] 에 남긴다.
+# 글자가 아주 많아서 텍스트가 이미지보다 비싸면 그냥 이미지를 보낸다.
+# OCR 이 ocr_timeout_ms 안에 안 끝나면 기다리지 않고 이미지를 보낸다.
+# 말풍선 / 대화 기록에는 원래 스크린샷이 그대로 남는다.
+#
+# pytesseract + tesseract 실행 파일이 필요 (없으면 자동으로 꺼짐)
+#
+# 설정
+#   ocr_prepass        : 사용 여부 (기본 false)
+#   ocr_lang           : tesseract 언어 (기본 "eng", 예: "eng+kor")
+#   ocr_min_confidence : 단어 평균 신뢰도 0~100 이 이 이상일 때만 대체 (기본 80)
+#   ocr_min_chars      : 글자가 이보다 적으면 그림으로 보냄 (기본 200)
+#   ocr_preview_edge   : 함께 보낼 미리보기 긴 변 (기본 384, 0 = 텍스트만)
+#   ocr_timeout_ms     : OCR 을 기다리는 최대 시간 (기본 1500, 시작 시점부터)
+
+DEFAULT_LANG = "eng"
+DEFAULT_MIN_CONFIDENCE = 80
+DEFAULT_MIN_CHARS = 200
+DEFAULT_PREVIEW_EDGE = 384      # 384px 이하 → 이미지 1장 최소 토큰
+DEFAULT_TIMEOUT_MS = 1500
+
+# tesseract 는 별도 프로세스라 GIL 과 무관하게 병렬로 돈다
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ocr")
+
+_available = None
+_available_lock = threading.Lock()
+
+
+def available():
+    """pytesseract 와 tesseract 실행 파일이 있는지 (한 번만 확인)"""
+    global _available
+    with _available_lock:
+        if _available is None:
+            try:
+                import pytesseract
+                pytesseract.get_tesseract_version()
+                _available = True
+            except Exception as e:
+                log(f"[ocr_prepass] tesseract not available → disabled ({e})")
+                _available = False
+        return _available
+
+
+def enabled():
+    return bool(settings.get("ocr_prepass", False)) and available()
+
+
+class OcrResult:
+    def __init__(self, text, confidence, elapsed_ms):
+        self.text = text
+        self.confidence = confidence    # 글자 수로 가중한 단어 평균 (0~100)
+        self.elapsed_ms = elapsed_ms
+
+
+# ----------------------------------------------------------
+# OCR (ocr 스레드)
+# ----------------------------------------------------------
+def start(pil_img):
+    """인코딩과 동시에 OCR 시작. 꺼져 있으면 None (결과는 wait 로)"""
+    if not enabled():
+        return None
+    return executor.submit(extract, pil_img), time.perf_counter()
+
+
+def wait(job):
+    """시작 후 ocr_timeout_ms 까지만 기다림. 늦거나 꺼져 있으면 None (→ 이미지 전송)"""
+    if job is None:
+        return None
+
+    future, started = job
+    timeout = float(settings.get("ocr_timeout_ms", DEFAULT_TIMEOUT_MS)) / 1000
+    try:
+        return future.result(timeout=max(0.0, started + timeout - time.perf_counter()))
+    except FutureTimeout:
+        future.cancel()
+        log(f"[ocr_prepass] no result within {timeout * 1000:.0f} ms → sending the image")
+        return None
+
+
+def extract(pil_img):
+    """return: OcrResult (실패하면 None)"""
+    import pytesseract
+
+    t0 = time.perf_counter()
+    try:
+        data = pytesseract.image_to_data(
+            pil_img.convert("L"),
+            lang=settings.get("ocr_lang", DEFAULT_LANG),
+            config="--psm 3 -c preserve_interword_spaces=1",
+            output_type=pytesseract.Output.DICT,
+        )
+    except Exception as e:
+        log(f"[ocr_prepass] extract ERROR: {e}")
+        return None
+
+    # 단어 → 줄 (block / paragraph / line 번호로 묶음), 문단 사이는 빈 줄
+    lines = []
+    current_key = None
+    current_par = None
+    weighted = 0.0
+    chars = 0
+
+    for i, word in enumerate(data["text"]):
+        word = (word or "").strip()
+        conf = float(data["conf"][i])
+        if not word or conf < 0:
+            continue
+
+        par = (data["block_num"][i], data["par_num"][i])
+        key = par + (data["line_num"][i],)
+        if key != current_key:
+            if current_par is not None and par != current_par:
+                lines.append("")
+            lines.append(word)
+            current_key, current_par = key, par
+        else:
+            lines[-1] += " " + word
+
+        weighted += conf * len(word)
+        chars += len(word)
+
+    confidence = weighted / chars if chars else 0.0
+    return OcrResult("\n".join(lines), confidence, (time.perf_counter() - t0) * 1000)
+
+
+def _screen_text(result):
+    return f"[Screen text (OCR)]\n{result.text}"
+
+
+def _preview_edge():
+    return int(settings.get("ocr_preview_edge", DEFAULT_PREVIEW_EDGE))
+
+
+def _preview_size(size, edge):
+    w, h = size
+    scale = min(1.0, edge / float(max(w, h)))
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def saved_tokens(pil_img, result):
+    """이미지 대신 텍스트 (+ 미리보기) 를 보낼 때 줄어드는 예상 토큰 (음수면 손해)"""
+    sent = estimate_text_tokens(_screen_text(result))
+    edge = _preview_edge()
+    if edge > 0:
+        sent += estimate_size_tokens(*_preview_size(pil_img.size, edge))
+    return estimate_size_tokens(*pil_img.size) - sent
+
+
+def accept(result, pil_img):
+    """이 결과로 이미지를 대체해도 되는지 (믿을 만하고, 실제로 더 싸야 함)"""
+    if result is None:
+        return False
+    min_conf = float(settings.get("ocr_min_confidence", DEFAULT_MIN_CONFIDENCE))
+    min_chars = int(settings.get("ocr_min_chars", DEFAULT_MIN_CHARS))
+    if result.confidence < min_conf or len(result.text) < min_chars:
+        return False
+
+    saved = saved_tokens(pil_img, result)
+    if saved <= 0:
+        log(f"[ocr_prepass] text would cost {-saved} more tokens than the image → sending the image")
+        return False
+    return True
+
+
+# ----------------------------------------------------------
+# 대체 (워커 스레드)
+# ----------------------------------------------------------
+def _preview(pil_img, edge):
+    from PIL import Image
+
+    return pil_img.convert("RGB").resize(
+        _preview_size(pil_img.size, edge), Image.LANCZOS, reducing_gap=2.0
+    )
+
+
+def substitute(pil_img, text, result, image_bytes):
+    """
+    pil_img 대신 OCR 텍스트 (+ 미리보기) 를 보내도록 바꾼다.
+    image_bytes = 원래 보냈을 업로드 바이트 수 (절약량 계산용)
+    return: (send_hash, send_text, report)
+    """
+    screen_text = _screen_text(result)
+    send_text = f"{text}\n\n{screen_text}" if text else screen_text
+
+    send_hash = None
+    sent_bytes = len(screen_text.encode("utf-8"))
+
+    edge = _preview_edge()
+    if edge > 0:
+        preview = _preview(pil_img, edge)
+        send_hash = blob_store.put_image(preview)
+        if send_hash:
+            options = payload_cache.current_options()
+            data = payload_cache.encode_payload(preview, *options)
+            payload_cache.store_payload(send_hash, data, options)
+            sent_bytes += len(data)
+
+    report = {
+        "confidence": round(result.confidence, 1),
+        "chars": len(result.text),
+        "ocr_ms": round(result.elapsed_ms, 1),
+        "saved_bytes": image_bytes - sent_bytes,
+        "saved_tokens": saved_tokens(pil_img, result),
+    }
+    log(f"[ocr_prepass] sent text instead of image {report}")
+    return send_hash, send_text, report
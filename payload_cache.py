@@ -0,0 +1,149 @@
+import os
+import io
+import traceback
+from collections import OrderedDict
+
+from PIL import Image
+
+from utils import log
+import blob_store
+import settings
+
+
+# ----------------------------------------------------------
+# 업로드용 이미지 캐시
+# ----------------------------------------------------------
+# 캡처 시점에 한 번만 "보낼 바이트"(축소 + JPEG/WebP)를 만들어 두고,
+# 이후 요청에서는 디코딩/재인코딩 없이 그대로 Part 로 보낸다.
+#   storage/payloads/<hash>_<max_edge>_<quality>.<ext>
+
+PAYLOAD_DIR = "storage/payloads"
+MEMORY_LIMIT = 32
+
+DEFAULT_MAX_EDGE = 2048
+DEFAULT_FORMAT = "JPEG"     # JPEG | WEBP | PNG
+DEFAULT_QUALITY = 90
+
+_MIME = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+_EXT = {"JPEG": "jpg", "WEBP": "webp", "PNG": "png"}
+
+_memory = OrderedDict()
+
+
+def current_options():
+    fmt = str(settings.get("upload_format", DEFAULT_FORMAT)).upper()
+    if fmt not in _MIME:
+        fmt = DEFAULT_FORMAT
+    return (
+        int(settings.get("upload_max_edge", DEFAULT_MAX_EDGE)),
+        fmt,
+        int(settings.get("upload_quality", DEFAULT_QUALITY)),
+    )
+
+
+def payload_path(blob_hash, max_edge, fmt, quality):
+    return os.path.join(
+        PAYLOAD_DIR, f"{blob_hash}_{max_edge}_{quality}.{_EXT[fmt]}"
+    )
+
+
+# ----------------------------------------------------------
+# 인코딩
+# ----------------------------------------------------------
+def encode_payload(pil_img, max_edge, fmt, quality):
+    img = pil_img.convert("RGB")
+
+    w, h = img.size
+    scale = max_edge / max(w, h)
+    if scale < 1:
+        img = img.resize(
+            (max(1, round(w * scale)), max(1, round(h * scale))),
+            Image.LANCZOS, reducing_gap=2.0
+        )
+
+    buffer = io.BytesIO()
+    if fmt == "PNG":
+        img.save(buffer, format="PNG", compress_level=6)
+    else:
+        img.save(buffer, format=fmt, quality=quality)
+    return buffer.getvalue()
+
+
+def build_payload(blob_hash, pil_img):
+    """캡처 직후 (이미 디코딩된 이미지로) 업로드 바이트를 만들어 둔다"""
+    options = current_options()
+    path = payload_path(blob_hash, *options)
+    if os.path.exists(path):
+        return path
+
+    try:
+        data = encode_payload(pil_img, *options)
+    except Exception as e:
+        log(f"[payload_cache] build_payload ERROR: {e}")
+        log(traceback.format_exc())
+        return None
+
+    return store_payload(blob_hash, data, options)
+
+
+def store_payload(blob_hash, data, options=None):
+    """encode_payload 결과를 저장 (options = encode 에 쓴 current_options())"""
+    max_edge, fmt, quality = options or current_options()
+    path = payload_path(blob_hash, max_edge, fmt, quality)
+    if os.path.exists(path):
+        return path
+
+    try:
+        os.makedirs(PAYLOAD_DIR, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        _remember((blob_hash, max_edge, fmt, quality), data)
+        return path
+    except Exception as e:
+        log(f"[payload_cache] store_payload ERROR: {e}")
+        log(traceback.format_exc())
+        return None
+
+
+def _remember(key, data):
+    _memory[key] = data
+    _memory.move_to_end(key)
+    while len(_memory) > MEMORY_LIMIT:
+        _memory.popitem(last=False)
+
+
+# ----------------------------------------------------------
+# 조회 → (bytes, mime_type)
+# ----------------------------------------------------------
+def get_payload(blob_hash):
+    max_edge, fmt, quality = current_options()
+    key = (blob_hash, max_edge, fmt, quality)
+
+    data = _memory.get(key)
+    if data is not None:
+        _memory.move_to_end(key)
+        return data, _MIME[fmt]
+
+    path = payload_path(blob_hash, max_edge, fmt, quality)
+    if not os.path.exists(path):
+        # 캐시 이전 기록 / 설정 변경 → 원본에서 한 번만 생성
+        try:
+            with Image.open(blob_store.blob_path(blob_hash)) as img:
+                path = build_payload(blob_hash, img)
+        except Exception as e:
+            log(f"[payload_cache] get_payload ERROR: {e}")
+            return None, None
+        if not path:
+            return None, None
+
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except Exception as e:
+        log(f"[payload_cache] read ERROR: {e}")
+        return None, None
+
+    _remember(key, data)
+    return data, _MIME[fmt]
@@ -0,0 +1,284 @@
+import time
+import random
+import asyncio
+import datetime
+import threading
+
+from utils import log, load_json, save_json
+import settings
+
+
+# ----------------------------------------------------------
+# 무료 플랜 요청 스케줄러 (RPM / RPD / 429 재시도)
+# ----------------------------------------------------------
+# GeminiClient 를 감싸서 같은 send_message 인터페이스를 제공한다.
+#   - 하루 사용량을 storage/quota.json 에 저장 (태평양 시간 자정에 초기화)
+#   - 분당 요청 수는 토큰 버킷으로 제한 (모자라면 기다렸다 보냄)
+#   - 429 → 지수 백오프 + jitter 로 재시도, 일일 한도 초과면 즉시 중단
+# 한도는 API 키 단위이므로 세션마다 스케줄러를 만들어도 사용량은 하나(_Quota)를 같이 쓴다.
+#
+# 설정
+#   rate_limit_rpm : 분당 요청 수 (기본 10)
+#   rate_limit_rpd : 하루 요청 수 (기본 20)
+
+QUOTA_PATH = "storage/quota.json"
+
+DEFAULT_RPM = 10
+DEFAULT_RPD = 20
+
+MAX_RETRIES = 4
+BACKOFF_BASE = 2.0       # 초
+BACKOFF_MAX = 60.0
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def _quota_day():
+    # Gemini API 일일 한도는 태평양 시간 자정 기준
+    try:
+        from zoneinfo import ZoneInfo
+        now = datetime.datetime.now(ZoneInfo("America/Los_Angeles"))
+    except Exception:
+        now = datetime.datetime.utcnow() - datetime.timedelta(hours=8)
+    return now.strftime("%Y-%m-%d")
+
+
+def is_rate_limit_error(e):
+    if getattr(e, "code", None) == 429:
+        return True
+    msg = str(e)
+    return "429" in msg or "RESOURCE_EXHAUSTED" in msg
+
+
+def is_daily_limit_error(e):
+    msg = str(e)
+    return "PerDay" in msg or "per day" in msg.lower()
+
+
+def rpm():
+    return max(1, int(settings.get("rate_limit_rpm", DEFAULT_RPM)))
+
+
+def rpd():
+    return max(1, int(settings.get("rate_limit_rpd", DEFAULT_RPD)))
+
+
+class _Quota:
+    """하루 사용량 + 분당 토큰 버킷 (프로세스에 하나)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = float(rpm())
+        self._last_refill = time.monotonic()
+
+        data = load_json(QUOTA_PATH) or {}
+        self._day = data.get("date")
+        self._count = int(data.get("count", 0))
+
+    def used_today(self):
+        with self._lock:
+            self._roll_day()
+            return self._count
+
+    def _roll_day(self):
+        today = _quota_day()
+        if self._day != today:
+            self._day = today
+            self._count = 0
+
+    def record(self, count=None):
+        with self._lock:
+            self._roll_day()
+            self._count = self._count + 1 if count is None else count
+            save_json(QUOTA_PATH, {"date": self._day, "count": self._count})
+
+    def take_token(self):
+        """토큰이 있으면 0, 없으면 기다려야 할 초"""
+        with self._lock:
+            limit = rpm()
+            now = time.monotonic()
+            self._tokens = min(limit, self._tokens + (now - self._last_refill) * limit / 60.0)
+            self._last_refill = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) * 60.0 / limit
+
+
+_quota = None
+_quota_lock = threading.Lock()
+
+
+def _shared_quota():
+    global _quota
+    with _quota_lock:
+        if _quota is None:
+            _quota = _Quota()
+        return _quota
+
+
+def remaining_today():
+    return max(0, rpd() - _shared_quota().used_today())
+
+
+class RequestScheduler:
+
+    def __init__(self, client):
+        self.client = client
+        self.on_status = None      # 상태 메시지 콜백 (워커 스레드에서 호출)
+        self._quota = _shared_quota()
+
+    # ------------------------------------------------------
+    # GeminiClient 와 같은 속성 접근 (history 등)
+    # ------------------------------------------------------
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    # ------------------------------------------------------
+    # 한도
+    # ------------------------------------------------------
+    def rpm(self):
+        return rpm()
+
+    def rpd(self):
+        return rpd()
+
+    def used_today(self):
+        return self._quota.used_today()
+
+    def remaining_today(self):
+        return max(0, self.rpd() - self.used_today())
+
+    def _record(self, count=None):
+        self._quota.record(count)
+        self._status(f"{self.remaining_today()}/{self.rpd()} requests left today")
+
+    def _status(self, message):
+        log(f"[quota_scheduler] {message}")
+        if self.on_status:
+            self.on_status(message)
+
+    # ------------------------------------------------------
+    # 토큰 버킷
+    # ------------------------------------------------------
+    def _take_token(self):
+        return self._quota.take_token()
+
+    def _sleep(self, seconds, cancel_event):
+        """취소되면 False"""
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            time.sleep(min(0.1, max(0.0, deadline - time.monotonic())))
+        return True
+
+    def acquire(self, cancel_event=None):
+        if self.remaining_today() <= 0:
+            raise QuotaExceeded(
+                f"Daily limit reached ({self.rpd()} requests). "
+                f"It resets at midnight Pacific time."
+            )
+
+        while True:
+            wait = self._take_token()
+            if wait <= 0:
+                return True
+            self._status(f"Rate limit: waiting {wait:.0f}s")
+            if not self._sleep(wait, cancel_event):
+                return False
+
+    # ------------------------------------------------------
+    # 전송 (GeminiClient.send_message 와 같은 시그니처)
+    # ------------------------------------------------------
+    def _retry_delay(self, e, attempt):
+        """429 처리: 재시도할 초 (재시도 불가면 예외)"""
+        if not is_rate_limit_error(e):
+            raise e
+
+        if is_daily_limit_error(e):
+            # 서버 기준 일일 한도 소진 → 카운터를 맞추고 중단
+            self._record(self.rpd())
+            raise QuotaExceeded(
+                "Daily limit reached on the server. "
+                "It resets at midnight Pacific time."
+            ) from e
+
+        if attempt > MAX_RETRIES:
+            raise e
+
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (attempt - 1)))
+        delay *= random.uniform(0.5, 1.5)
+        self._status(f"Rate limited (429), retrying in {delay:.0f}s")
+        return delay
+
+    def _record_attempt(self, error=None):
+        # 429 로 거절된 시도는 서버 한도를 쓰지 않으므로 세지 않음
+        if error is None or not is_rate_limit_error(error):
+            self._record()
+
+    def send_message(self, text="", image_hash=None, on_delta=None, cancel_event=None):
+        attempt = 0
+        started = False
+
+        def forward(delta):
+            nonlocal started
+            started = True
+            if on_delta:
+                on_delta(delta)
+
+        while True:
+            if not self.acquire(cancel_event):
+                return ""
+
+            try:
+                result = self.client.send_message(
+                    text, image_hash, on_delta=forward, cancel_event=cancel_event
+                )
+            except Exception as e:
+                # 이미 글자를 말풍선에 보냈다면 재시도하지 않음 (같은 답이 두 번 붙음)
+                if started:
+                    self._record_attempt()
+                    raise
+                self._record_attempt(e)
+                attempt += 1
+                delay = self._retry_delay(e, attempt)
+                if not self._sleep(delay, cancel_event):
+                    return ""
+            else:
+                self._record_attempt()
+                return result
+
+    async def stream(self, text="", image_hash=None, cancel_event=None):
+        """GeminiClient.stream 의 한도 관리 버전"""
+        attempt = 0
+
+        while True:
+            if not await asyncio.to_thread(self.acquire, cancel_event):
+                return
+
+            started = False
+            agen = self.client.stream(text, image_hash)
+            try:
+                async for delta in agen:
+                    if not started:
+                        started = True
+                        self._record_attempt()
+                    yield delta
+                if not started:
+                    self._record_attempt()
+                return
+            except Exception as e:
+                # 이미 글자를 받기 시작했다면 재시도하지 않음
+                if started:
+                    raise
+                self._record_attempt(e)
+                attempt += 1
+                delay = self._retry_delay(e, attempt)
+            finally:
+                await agen.aclose()
+
+            await asyncio.sleep(delay)
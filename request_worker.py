@@ -0,0 +1,366 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, QThread, Signal, Slot
+
+from utils import log
+import latency_trace
+
+
+# ----------------------------------------------------------
+# Gemini 요청 워커 (GUI 스레드 밖에서 스트리밍)
+# ----------------------------------------------------------
+class RequestWorker(QObject):
+    """
+    전용 QThread 안에서 GeminiClient.send_message 를 실행한다.
+    결과는 모두 signal 로 전달되므로 GUI 쪽 슬롯은 queued 로 호출된다.
+    """
+
+    prepared = Signal(int, object)    # (req_id, prepare() 결과)
+    delta = Signal(int, str)          # (req_id, chunk)
+    finished = Signal(int, str)       # (req_id, full_text)
+    failed = Signal(int, str)         # (req_id, error message)
+    cancelled = Signal(int, str)      # (req_id, 중단 시점까지 받은 텍스트)
+    status = Signal(str)              # 대기 / 남은 한도 등 안내 메시지
+
+    _submit = Signal(int, object)
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+        self._lock = threading.Lock()
+        self._cancel_events = {}
+        self._queued = {}       # 아직 시작 안 한 요청 (req_id -> job)
+        self._next_id = 0
+
+        self._thread = QThread()
+        self._thread.setObjectName("GeminiRequestWorker")
+        self.moveToThread(self._thread)
+        self._submit.connect(self._run)
+        self._thread.start()
+
+    # ------------------------------------------------------
+    # GUI 스레드에서 호출
+    # ------------------------------------------------------
+    def submit(self, text="", image_hash=None, prepare=None, trace=None):
+        """
+        prepare: 워커 스레드에서 먼저 실행할 함수 (캡처 인코딩 등).
+                 send_text / send_hash 속성을 가진 객체를 반환하면
+                 그 값으로 요청을 보내고, prepared signal 로 GUI 에 알린다.
+        trace  : latency_trace.Trace (워커 쪽 단계도 같은 기록에 남김)
+        """
+        with self._lock:
+            self._next_id += 1
+            req_id = self._next_id
+            self._cancel_events[req_id] = threading.Event()
+            job = {"text": text, "image_hash": image_hash, "prepare": prepare, "trace": trace}
+            self._queued[req_id] = job
+
+        self._submit.emit(req_id, job)
+        return req_id
+
+    def try_append_text(self, req_id, text):
+        """
+        아직 시작 안 한 텍스트 요청에 내용을 합친다 (연타 → 요청 1번).
+        이미 시작했으면 False.
+        """
+        with self._lock:
+            job = self._queued.get(req_id)
+            if job is None or job["prepare"] is not None:
+                return False
+            job["text"] = f"{job['text']}\n{text}" if job["text"] else text
+            return True
+
+    def cancel(self, req_id=None):
+        """req_id 가 없으면 진행/대기 중인 모든 요청을 취소"""
+        with self._lock:
+            if req_id is None:
+                events = list(self._cancel_events.values())
+            else:
+                events = [self._cancel_events.get(req_id)]
+
+        for ev in events:
+            if ev:
+                ev.set()
+
+    def is_busy(self):
+        with self._lock:
+            return bool(self._cancel_events)
+
+    def shutdown(self):
+        self.cancel()
+        self._thread.quit()
+        self._thread.wait(3000)
+
+    # ------------------------------------------------------
+    # 워커 스레드에서 실행
+    # ------------------------------------------------------
+    @Slot(int, object)
+    def _run(self, req_id, job):
+        with latency_trace.active(job.get("trace")):
+            self._run_job(req_id, job)
+
+    def _run_job(self, req_id, job):
+        with self._lock:
+            cancel_event = self._cancel_events.get(req_id)
+            self._queued.pop(req_id, None)
+
+        if cancel_event is None or cancel_event.is_set():
+            self._finish(req_id)
+            self.cancelled.emit(req_id, "")
+            return
+
+        text = job["text"]
+        image_hash = job["image_hash"]
+
+        if job.get("prepare"):
+            try:
+                result = job["prepare"]()
+            except Exception as e:
+                log(f"[request_worker] prepare ERROR: {e}")
+                self._finish(req_id)
+                self.failed.emit(req_id, str(e))
+                return
+
+            latency_trace.mark("encoded")
+            self.prepared.emit(req_id, result)
+            text, image_hash = result.send_text, result.send_hash
+
+            if cancel_event.is_set():
+                self._finish(req_id)
+                self.cancelled.emit(req_id, "")
+                return
+
+        received = []
+
+        def on_delta(chunk):
+            latency_trace.mark("first_token")
+            received.append(chunk)
+            self.delta.emit(req_id, chunk)
+
+        try:
+            full_text = self.client.send_message(
+                text,
+                image_hash,
+                on_delta=on_delta,
+                cancel_event=cancel_event
+            )
+        except Exception as e:
+            log(f"[request_worker] ERROR: {e}")
+            self._finish(req_id)
+            if cancel_event.is_set():
+                self.cancelled.emit(req_id, "".join(received))
+            else:
+                self.failed.emit(req_id, str(e))
+            return
+
+        latency_trace.mark("last_token")
+        self._finish(req_id)
+        if cancel_event.is_set():
+            self.cancelled.emit(req_id, full_text)
+        else:
+            self.finished.emit(req_id, full_text)
+
+    def _finish(self, req_id):
+        with self._lock:
+            self._cancel_events.pop(req_id, None)
+            self._queued.pop(req_id, None)
+
+
+# ----------------------------------------------------------
+# asyncio 버전 (client.stream 을 async for 로 소비)
+# ----------------------------------------------------------
+_shared_loop = None
+_shared_loop_lock = threading.Lock()
+
+
+def shared_loop():
+    """
+    모든 AsyncRequestWorker(세션마다 하나)가 같이 쓰는 이벤트 루프.
+    세션들이 genai.Client 하나를 공유하고, 그 aio HTTP 풀은 루프 하나에 묶이므로
+    워커마다 루프를 따로 만들면 동시에 스트리밍할 때 "different loop" 오류가 난다.
+    """
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            _shared_loop = asyncio.new_event_loop()
+
+            def loop_main():
+                asyncio.set_event_loop(_shared_loop)
+                _shared_loop.run_forever()
+
+            threading.Thread(target=loop_main, name="GeminiAsyncLoop", daemon=True).start()
+        return _shared_loop
+
+
+class AsyncRequestWorker(QObject):
+    """
+    RequestWorker 와 같은 signal / 메서드.
+    공유 이벤트 루프(shared_loop) 위에서 이 워커의 요청을 처리한다.
+      - prepare (캡처 인코딩) 는 앞 요청이 스트리밍 중일 때 미리 실행
+      - 스트리밍은 제출 순서대로 (히스토리 순서 유지)
+      - 취소 = task.cancel() → 네트워크 대기 중이어도 즉시 중단
+    """
+
+    prepared = Signal(int, object)
+    delta = Signal(int, str)
+    finished = Signal(int, str)
+    failed = Signal(int, str)
+    cancelled = Signal(int, str)
+    status = Signal(str)
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+        self._lock = threading.Lock()
+        self._cancel_events = {}
+        self._queued = {}       # 아직 스트리밍 시작 안 한 요청 (req_id -> job)
+        self._tasks = {}        # req_id -> asyncio.Task
+        self._next_id = 0
+        self._tail = None       # 마지막으로 제출된 요청의 task (루프 스레드에서만 접근)
+
+        # ChangeDetector 등은 스레드 안전하지 않으므로 prepare 는 한 번에 하나씩
+        self._prepare_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prepare")
+
+        self._loop = shared_loop()
+
+    # ------------------------------------------------------
+    # GUI 스레드에서 호출
+    # ------------------------------------------------------
+    def submit(self, text="", image_hash=None, prepare=None, trace=None):
+        with self._lock:
+            self._next_id += 1
+            req_id = self._next_id
+            self._cancel_events[req_id] = threading.Event()
+            job = {"text": text, "image_hash": image_hash, "prepare": prepare, "trace": trace}
+            self._queued[req_id] = job
+
+        asyncio.run_coroutine_threadsafe(self._run(req_id, job), self._loop)
+        return req_id
+
+    def try_append_text(self, req_id, text):
+        with self._lock:
+            job = self._queued.get(req_id)
+            if job is None or job["prepare"] is not None:
+                return False
+            job["text"] = f"{job['text']}\n{text}" if job["text"] else text
+            return True
+
+    def cancel(self, req_id=None):
+        with self._lock:
+            if req_id is None:
+                ids = list(self._cancel_events)
+            else:
+                ids = [req_id]
+            events = [self._cancel_events.get(i) for i in ids]
+
+        for ev in events:
+            if ev:
+                ev.set()
+        for i in ids:
+            self._loop.call_soon_threadsafe(self._cancel_task, i)
+
+    def is_busy(self):
+        with self._lock:
+            return bool(self._cancel_events)
+
+    def shutdown(self):
+        # 루프는 다른 세션도 쓰므로 멈추지 않고 이 워커의 요청만 취소 (루프 스레드는 daemon)
+        self.cancel()
+        self._prepare_pool.shutdown(wait=False)
+
+    # ------------------------------------------------------
+    # 이벤트 루프 스레드에서 실행
+    # ------------------------------------------------------
+    def _cancel_task(self, req_id):
+        task = self._tasks.get(req_id)
+        if task is not None:
+            task.cancel()
+
+    async def _run(self, req_id, job):
+        # run_coroutine_threadsafe 는 제출 순서대로 시작되므로 여기서 순서가 정해진다
+        previous, self._tail = self._tail, asyncio.current_task()
+
+        # task 마다 context 가 따로라서 다른 요청의 기록과 섞이지 않음
+        with latency_trace.active(job.get("trace")):
+            await self._run_job(req_id, job, previous)
+
+    async def _run_job(self, req_id, job, previous):
+        with self._lock:
+            cancel_event = self._cancel_events.get(req_id)
+            self._tasks[req_id] = asyncio.current_task()
+
+        received = []
+        try:
+            if cancel_event is None or cancel_event.is_set():
+                raise asyncio.CancelledError
+
+            image_hash = job["image_hash"]
+            result = None
+
+            if job.get("prepare"):
+                # 앞 요청이 스트리밍하는 동안 미리 인코딩
+                try:
+                    result = await self._loop.run_in_executor(self._prepare_pool, job["prepare"])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log(f"[request_worker] prepare ERROR: {e}")
+                    self._finish(req_id)
+                    self.failed.emit(req_id, str(e))
+                    return
+                latency_trace.mark("encoded")
+
+            # 앞 요청이 끝나야 히스토리에 이어서 보낼 수 있음
+            if previous is not None:
+                await asyncio.wait([previous])
+
+            with self._lock:
+                self._queued.pop(req_id, None)
+            text = job["text"]
+
+            if result is not None:
+                self.prepared.emit(req_id, result)
+                text, image_hash = result.send_text, result.send_hash
+
+            if cancel_event.is_set():
+                raise asyncio.CancelledError
+
+            agen = self.client.stream(text, image_hash, cancel_event=cancel_event)
+            try:
+                async for chunk in agen:
+                    latency_trace.mark("first_token")
+                    received.append(chunk)
+                    self.delta.emit(req_id, chunk)
+            finally:
+                await agen.aclose()
+            latency_trace.mark("last_token")
+
+        except asyncio.CancelledError:
+            self._finish(req_id)
+            self.cancelled.emit(req_id, "".join(received))
+            return
+        except Exception as e:
+            log(f"[request_worker] ERROR: {e}")
+            self._finish(req_id)
+            if cancel_event.is_set():
+                self.cancelled.emit(req_id, "".join(received))
+            else:
+                self.failed.emit(req_id, str(e))
+            return
+
+        self._finish(req_id)
+        full_text = "".join(received)
+        if cancel_event.is_set():
+            self.cancelled.emit(req_id, full_text)
+        else:
+            self.finished.emit(req_id, full_text)
+
+    def _finish(self, req_id):
+        with self._lock:
+            self._cancel_events.pop(req_id, None)
+            self._queued.pop(req_id, None)
+            self._tasks.pop(req_id, None)
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+from utils import log
+import blob_store
+import settings
+
+
+# ----------------------------------------------------------
+# 응답 캐시 (같은 질문 + 같은 스크린샷 → 네트워크 없이 재생)
+# ----------------------------------------------------------
+# 키 = sha256(시스템 프롬프트, 텍스트, 이미지 해시들, 모델명)
+# storage/response_cache.db 에 저장, TTL + 크기 기준 LRU 삭제
+#
+# 설정
+#   response_cache            : 사용 여부 (기본 false, opt-in)
+#   response_cache_ttl_hours  : 유효 시간 (기본 24)
+#   response_cache_max_mb     : 최대 크기 (기본 20)
+
+CACHE_PATH = "storage/response_cache.db"
+
+DEFAULT_TTL_HOURS = 24
+DEFAULT_MAX_MB = 20
+
+REPLAY_CHUNK = 48   # 캐시 재생 시 on_delta 한 번에 넘기는 글자 수
+
+
+def make_key(system_prompt, text, image_hashes, model):
+    raw = json.dumps(
+        [system_prompt or "", text or "", [h for h in image_hashes if h], model],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+
+    def __init__(self, path=CACHE_PATH):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key       TEXT PRIMARY KEY,
+                response  TEXT NOT NULL,
+                created   REAL NOT NULL,
+                last_used REAL NOT NULL,
+                size      INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def ttl_seconds(self):
+        return float(settings.get("response_cache_ttl_hours", DEFAULT_TTL_HOURS)) * 3600
+
+    def max_bytes(self):
+        return int(float(settings.get("response_cache_max_mb", DEFAULT_MAX_MB)) * 1024 * 1024)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds():
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            return row[0]
+
+    def put(self, key, response):
+        if not response:
+            return
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created, last_used, size) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, now, now, size)
+            )
+            self._evict(now)
+            self.conn.commit()
+
+    def _evict(self, now):
+        self.conn.execute(
+            "DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds(),)
+        )
+
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        limit = self.max_bytes()
+        if total <= limit:
+            return
+
+        for key, size in self.conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_used"
+        ).fetchall():
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= limit:
+                break
+
+
+# ----------------------------------------------------------
+# 클라이언트 래퍼 (send_message 인터페이스 동일)
+# ----------------------------------------------------------
+class CachingClient:
+    """
+    inner : RequestScheduler 또는 GeminiClient
+    gemini: 히스토리 / 모델명 / 시스템 프롬프트를 가진 GeminiClient
+    """
+
+    def __init__(self, inner, gemini):
+        self.inner = inner
+        self.gemini = gemini
+        self._cache = None
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def enabled(self):
+        return bool(settings.get("response_cache", False))
+
+    def _get_cache(self):
+        if self._cache is None:
+            self._cache = ResponseCache()
+        return self._cache
+
+    def _key(self, text, image_hash):
+        import Gemini_client
+        return make_key(
+            Gemini_client.SYSTEM_PROMPT, text, blob_store.split_hashes(image_hash), self.gemini.model
+        )
+
+    def send_message(self, text="", image_hash=None, on_delta=None, cancel_event=None):
+        if not self.enabled():
+            return self.inner.send_message(
+                text, image_hash, on_delta=on_delta, cancel_event=cancel_event
+            )
+
+        key = self._key(text, image_hash)
+        cache = self._get_cache()
+
+        cached = cache.get(key)
+        if cached is not None:
+            log("[response_cache] hit")
+            if on_delta:
+                for i in range(0, len(cached), REPLAY_CHUNK):
+                    on_delta(cached[i:i + REPLAY_CHUNK])
+            self.gemini.record_exchange(text, image_hash, cached)
+            return cached
+
+        full_text = self.inner.send_message(
+            text, image_hash, on_delta=on_delta, cancel_event=cancel_event
+        )
+
+        # 중간에 취소된 답은 저장하지 않음
+        if full_text and not (cancel_event is not None and cancel_event.is_set()):
+            cache.put(key, full_text)
+        return full_text
+
+    async def stream(self, text="", image_hash=None, cancel_event=None):
+        if not self.enabled():
+            agen = self.inner.stream(text, image_hash, cancel_event=cancel_event)
+            try:
+                async for delta in agen:
+                    yield delta
+            finally:
+                await agen.aclose()
+            return
+
+        key = self._key(text, image_hash)
+        cache = self._get_cache()
+
+        cached = cache.get(key)
+        if cached is not None:
+            log("[response_cache] hit")
+            self.gemini.record_exchange(text, image_hash, cached)
+            for i in range(0, len(cached), REPLAY_CHUNK):
+                yield cached[i:i + REPLAY_CHUNK]
+            return
+
+        received = []
+        completed = False
+        agen = self.inner.stream(text, image_hash, cancel_event=cancel_event)
+        try:
+            async for delta in agen:
+                received.append(delta)
+                yield delta
+            completed = True
+        finally:
+            await agen.aclose()
+            # 중간에 취소된 답은 저장하지 않음
+            if completed and received:
+                cache.put(key, "".join(received))
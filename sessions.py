@@ -0,0 +1,186 @@
+import os
+import re
+
+from PySide6.QtCore import QObject
+
+from utils import load_json, save_json, log
+import settings
+from history_store import HistoryStore, DEFAULT_DB_PATH
+from chat_view import ChatView
+from change_detect import ChangeDetector
+from quota_scheduler import RequestScheduler
+from response_cache import CachingClient
+from request_worker import RequestWorker, AsyncRequestWorker
+
+
+# ----------------------------------------------------------
+# 이름 붙은 대화 세션 (여러 개가 동시에 스트리밍)
+# ----------------------------------------------------------
+# 세션마다 따로: 대화 기록 DB, Gemini 대화 히스토리 + 요약, 요청 워커, 채팅 화면
+# 같이 씀    : Gemini 연결 (GeminiClient.new_session), 무료 한도 카운터
+#
+# 저장 위치
+#   기본 세션 : storage/chat_history.db, storage/summary.json (예전 그대로)
+#   그 외     : storage/sessions/<폴더>/chat_history.db, summary.json, session.json(이름)
+#   마지막으로 보던 세션 : storage/sessions/active.json
+#
+# 세션은 처음 열 때 DB / 화면을 만들고, 워커는 처음 보낼 때 만든다
+# (안 쓰는 세션은 시작 비용 0, 한 번 연 세션은 전환이 즉시).
+
+SESSIONS_DIR = "storage/sessions"
+ACTIVE_PATH = os.path.join(SESSIONS_DIR, "active.json")
+DEFAULT_SESSION = "Default"
+
+
+def _folder_name(name):
+    slug = re.sub(r"[^\w\-]+", "_", name.strip(), flags=re.UNICODE).strip("_")
+    return slug[:40] or "session"
+
+
+def list_sessions():
+    """return: [(이름, 폴더)] (기본 세션의 폴더는 None)"""
+    found = [(DEFAULT_SESSION, None)]
+    if not os.path.isdir(SESSIONS_DIR):
+        return found
+
+    for entry in sorted(os.listdir(SESSIONS_DIR)):
+        folder = os.path.join(SESSIONS_DIR, entry)
+        meta = load_json(os.path.join(folder, "session.json"))
+        if os.path.isdir(folder) and meta and meta.get("name"):
+            found.append((meta["name"], folder))
+    return found
+
+
+def create_session_folder(name):
+    """새 세션 폴더를 만들고 폴더 경로 반환 (같은 이름이 있으면 None)"""
+    if any(existing == name for existing, _ in list_sessions()):
+        return None
+
+    base = os.path.join(SESSIONS_DIR, _folder_name(name))
+    folder, n = base, 2
+    while os.path.exists(folder):
+        folder, n = f"{base}_{n}", n + 1
+
+    os.makedirs(folder)
+    save_json(os.path.join(folder, "session.json"), {"name": name})
+    return folder
+
+
+def last_active():
+    data = load_json(ACTIVE_PATH) or {}
+    return data.get("name", DEFAULT_SESSION)
+
+
+def remember_active(name):
+    save_json(ACTIVE_PATH, {"name": name})
+
+
+class ChatSession(QObject):
+    """
+    워커 signal 은 이 객체(GUI 스레드)의 슬롯으로 받아서
+    window 의 처리 함수에 세션을 붙여 넘긴다 (다른 세션이 보이는 중이어도 자기 화면에 그림).
+    window: on_capture_prepared / on_stream_delta / on_stream_finished /
+            on_stream_failed / on_stream_cancelled / on_status(message, session) 를 가진 MainWindow
+    """
+
+    def __init__(self, name, folder, base_client, window):
+        super().__init__(window)
+        self.name = name
+        self.folder = folder
+        self.window = window
+
+        if folder is None:
+            self.Gemini = base_client
+        else:
+            self.Gemini = base_client.new_session(os.path.join(folder, "summary.json"))
+
+        self.history_store = None
+        self.chat_view = None
+        self.scheduler = None
+        self.worker = None
+
+        self.streams = {}   # req_id -> StreamingTextSink
+        self.traces = {}    # req_id -> latency_trace.Trace
+        self.pending_user = {}   # req_id -> (사용자 말풍선, text) : 인코딩 대기 중
+        self.last_text_request = None   # (req_id, Gemini 말풍선) : 연타 합치기용
+        self.sent_captures = {}  # req_id -> PreparedCapture : 답변이 끝나면 변화 감지 기준 반영
+
+        # 같은 화면 재전송 방지 (세션마다 모델이 본 화면이 다름)
+        self.change_detector = ChangeDetector(known_hashes=self.Gemini.image_hashes)
+
+    def is_streaming(self):
+        return bool(self.streams)
+
+    def is_busy(self):
+        return self.worker is not None and self.worker.is_busy()
+
+    # ------------------------------------------------------
+    # 지연 생성
+    # ------------------------------------------------------
+    def open_view(self, defer_migrations=False):
+        """
+        처음 볼 때 DB + 채팅 화면 생성 (최근 페이지 로드는 호출한 쪽에서)
+        defer_migrations: 예전 기록 이전 / 색인은 호출한 쪽이 history_store.migrate() 로
+        """
+        if self.chat_view is not None:
+            return False
+
+        if self.folder is None:
+            self.history_store = HistoryStore(defer_migrations=defer_migrations)
+        else:
+            self.history_store = HistoryStore(
+                path=os.path.join(self.folder, os.path.basename(DEFAULT_DB_PATH)),
+                legacy_json_path=None,
+                defer_migrations=defer_migrations,
+            )
+        self.chat_view = ChatView(self.history_store)
+        log(f"[sessions] opened {self.name}")
+        return True
+
+    def ensure_worker(self):
+        if self.worker is not None:
+            return self.worker
+
+        # 무료 플랜 한도(RPM/RPD) 관리 + 429 재시도 (한도 카운터는 세션끼리 공유)
+        self.scheduler = RequestScheduler(self.Gemini)
+
+        # 스트리밍은 워커 스레드에서, 결과는 queued signal 로 수신
+        # (opt-in) 같은 질문 + 같은 화면이면 캐시된 답을 바로 재생
+        # async_requests 설정 시 asyncio 워커 (다음 캡처 인코딩이 현재 스트림과 겹침)
+        worker_class = AsyncRequestWorker if settings.get("async_requests", False) else RequestWorker
+        self.worker = worker_class(CachingClient(self.scheduler, self.Gemini))
+        self.scheduler.on_status = self.worker.status.emit
+        self.worker.status.connect(self.on_status)
+        self.worker.prepared.connect(self.on_prepared)
+        self.worker.delta.connect(self.on_delta)
+        self.worker.finished.connect(self.on_finished)
+        self.worker.failed.connect(self.on_failed)
+        self.worker.cancelled.connect(self.on_cancelled)
+        return self.worker
+
+    # ------------------------------------------------------
+    # 워커 signal → window (GUI 스레드)
+    # ------------------------------------------------------
+    def on_status(self, message):
+        self.window.on_status(message, self)
+
+    def on_prepared(self, req_id, prepared):
+        self.window.on_capture_prepared(self, req_id, prepared)
+
+    def on_delta(self, req_id, text_chunk):
+        self.window.on_stream_delta(self, req_id, text_chunk)
+
+    def on_finished(self, req_id, full_text):
+        self.window.on_stream_finished(self, req_id, full_text)
+
+    def on_failed(self, req_id, message):
+        self.window.on_stream_failed(self, req_id, message)
+
+    def on_cancelled(self, req_id, partial_text):
+        self.window.on_stream_cancelled(self, req_id, partial_text)
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.shutdown()
+        if self.history_store is not None:
+            self.history_store.close()
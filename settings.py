@@ -0,0 +1,34 @@
+from utils import load_json, save_json
+
+
+# ----------------------------------------------------------
+# 사용자 설정 (storage/settings.json)
+# ----------------------------------------------------------
+# 파일에 없는 항목은 각 모듈이 넘겨주는 기본값을 사용한다.
+
+SETTINGS_PATH = "storage/settings.json"
+
+_data = None
+
+
+def _load():
+    global _data
+    if _data is None:
+        data = load_json(SETTINGS_PATH)
+        _data = data if isinstance(data, dict) else {}
+    return _data
+
+
+def get(key, default=None):
+    return _load().get(key, default)
+
+
+def set_value(key, value):
+    _load()[key] = value
+    save_json(SETTINGS_PATH, _data)
+
+
+def reload():
+    global _data
+    _data = None
+    return _load()
@@ -0,0 +1,50 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_store import HistoryStore
+
+
+class LikeSearchTest(unittest.TestCase):
+    """FTS5 가 없는 SQLite 빌드의 LIKE 검색"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        with mock.patch.object(HistoryStore, "_init_fts", return_value=False):
+            self.store = HistoryStore(
+                path=os.path.join(self.folder, "chat_history.db"), legacy_json_path=None
+            )
+        self.assertFalse(self.store.fts)
+
+        for text in ("CPU at 100% again", "CPU at 1000 MHz",
+                     "open file_name.txt", "open file-name.txt",
+                     r"path C:\temp\x", r"path C:tempx"):
+            self.store.append("user", text, None, "12:00", "2025-01-01")
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def search_texts(self, query):
+        return [entry["text"] for entry in self.store.search(query)]
+
+    def test_percent_is_literal(self):
+        self.assertEqual(self.search_texts("100%"), ["CPU at 100% again"])
+
+    def test_underscore_is_literal(self):
+        self.assertEqual(self.search_texts("file_name"), ["open file_name.txt"])
+
+    def test_backslash_is_literal(self):
+        self.assertEqual(self.search_texts("C:\\temp"), [r"path C:\temp\x"])
+
+    def test_plain_substring(self):
+        self.assertEqual(self.search_texts("CPU"), ["CPU at 1000 MHz", "CPU at 100% again"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import traceback
+from collections import OrderedDict
+
+from PIL import Image
+from PySide6.QtGui import QPixmap
+
+from utils import log
+import blob_store
+
+
+# ----------------------------------------------------------
+# 말풍선 썸네일 캐시
+# ----------------------------------------------------------
+# 디스크: storage/thumbs/<hash>_<width>.png (작은 PNG)
+# 메모리: 최근 사용한 QPixmap LRU
+# 썸네일이 한 번 만들어지면 원본 스크린샷은 다시 디코딩하지 않는다.
+
+THUMB_DIR = "storage/thumbs"
+MEMORY_LIMIT = 256
+
+_memory = OrderedDict()
+
+
+def thumb_path(blob_hash, width):
+    return os.path.join(THUMB_DIR, f"{blob_hash}_{width}.png")
+
+
+def _remember(key, pix):
+    _memory[key] = pix
+    _memory.move_to_end(key)
+    while len(_memory) > MEMORY_LIMIT:
+        _memory.popitem(last=False)
+
+
+# ----------------------------------------------------------
+# 썸네일 생성 / 저장
+# ----------------------------------------------------------
+def make_thumbnail(pil_img, width):
+    w, h = pil_img.size
+    height = max(1, round(h * width / w))
+    # reducing_gap → 큰 이미지는 정수배 축소 후 리샘플링 (훨씬 빠름)
+    return pil_img.convert("RGB").resize(
+        (width, height), Image.LANCZOS, reducing_gap=2.0
+    )
+
+
+def store_thumbnail(blob_hash, thumb_img, width):
+    """make_thumbnail 결과를 디스크에 저장"""
+    path = thumb_path(blob_hash, width)
+    if os.path.exists(path):
+        return path
+
+    try:
+        os.makedirs(THUMB_DIR, exist_ok=True)
+        tmp = path + ".tmp"
+        thumb_img.save(tmp, format="PNG")
+        os.replace(tmp, path)
+        return path
+    except Exception as e:
+        log(f"[thumbnail_cache] store_thumbnail ERROR: {e}")
+        log(traceback.format_exc())
+        return None
+
+
+def save_thumbnail(blob_hash, pil_img, width):
+    """이미 디코딩된 이미지에서 바로 썸네일 저장 (캡처 직후 호출)"""
+    path = thumb_path(blob_hash, width)
+    if os.path.exists(path):
+        return path
+
+    try:
+        return store_thumbnail(blob_hash, make_thumbnail(pil_img, width), width)
+    except Exception as e:
+        log(f"[thumbnail_cache] save_thumbnail ERROR: {e}")
+        log(traceback.format_exc())
+        return None
+
+
+def _build_from_blob(blob_hash, width):
+    try:
+        with Image.open(blob_store.blob_path(blob_hash)) as img:
+            return save_thumbnail(blob_hash, img, width)
+    except Exception as e:
+        log(f"[thumbnail_cache] build ERROR: {e}")
+        return None
+
+
+# ----------------------------------------------------------
+# 조회 (GUI 스레드)
+# ----------------------------------------------------------
+def get_thumbnail(blob_hash, width):
+    key = (blob_hash, width)
+
+    pix = _memory.get(key)
+    if pix is not None:
+        _memory.move_to_end(key)
+        return pix
+
+    path = thumb_path(blob_hash, width)
+    if not os.path.exists(path):
+        path = _build_from_blob(blob_hash, width)
+        if not path:
+            return None
+
+    pix = QPixmap(path)
+    if pix.isNull():
+        return None
+
+    _remember(key, pix)
+    return pix
@@ -0,0 +1,111 @@
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtGui import QAction
+from PySide6.QtWidgets import QApplication, QMenu, QSystemTrayIcon
+
+from utils import log
+import settings
+
+
+# ----------------------------------------------------------
+# 상주(트레이) 모드 + 전역 단축키
+# ----------------------------------------------------------
+# 창을 닫아도 프로세스 / Qt / Gemini 연결은 그대로 살아 있고,
+# 어느 프로그램에서든 단축키 한 번으로 캡처 + 전송.
+#
+# 설정
+#   tray_mode : 사용 여부 (기본 false)
+#   hotkeys   : {"동작": "pynput 조합"} 로 기본값 덮어쓰기 ("" 이면 끔)
+#               동작 = full | region | window | monitor | burst | toggle
+
+DEFAULT_HOTKEYS = {
+    "full": "<ctrl>+<alt>+g",
+    "region": "<ctrl>+<alt>+r",
+    "window": "<ctrl>+<alt>+w",
+    "burst": "<ctrl>+<alt>+b",
+    "toggle": "<ctrl>+<alt>+<space>",
+}
+
+
+def current_hotkeys():
+    hotkeys = dict(DEFAULT_HOTKEYS)
+    hotkeys.update(settings.get("hotkeys", {}) or {})
+    return {action: combo for action, combo in hotkeys.items() if combo}
+
+
+class GlobalHotkeys(QObject):
+    """
+    pynput 리스너는 자기 스레드에서 콜백을 부르므로
+    signal 로 넘겨서 GUI 스레드 슬롯이 queued 로 실행되게 한다.
+    """
+
+    activated = Signal(str)    # 동작 이름
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def start(self):
+        try:
+            from pynput import keyboard
+        except ImportError:
+            log("[tray_mode] pynput not installed → global hotkeys disabled")
+            return False
+
+        bindings = {}
+        for action, combo in current_hotkeys().items():
+            bindings[combo] = lambda action=action: self.activated.emit(action)
+
+        try:
+            self._listener = keyboard.GlobalHotKeys(bindings)
+            self._listener.daemon = True
+            self._listener.start()
+        except Exception as e:
+            log(f"[tray_mode] hotkey listener ERROR: {e}")
+            self._listener = None
+            return False
+
+        log(f"[tray_mode] hotkeys: {list(bindings)}")
+        return True
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+class ResidentTray(QObject):
+    """
+    트레이 아이콘. 클릭 → 창 보이기/숨기기, 메뉴 → 캡처 / 종료.
+    window 는 toggle_window(), send_with_capture(), quit_app() 을 가진 MainWindow.
+    """
+
+    def __init__(self, window, icon):
+        super().__init__(window)
+        self.window = window
+
+        self.menu = QMenu()
+        self._add_action("Show / Hide", window.toggle_window)
+        self._add_action("Capture and ask", window.send_with_capture)
+        self.menu.addSeparator()
+        self._add_action("Quit", window.quit_app)
+
+        self.icon = QSystemTrayIcon(icon, window)
+        self.icon.setToolTip("AutoCaptureGemini")
+        self.icon.setContextMenu(self.menu)
+        self.icon.activated.connect(self.on_activated)
+        self.icon.show()
+
+        # 마지막 창이 닫혀도 종료하지 않음
+        QApplication.instance().setQuitOnLastWindowClosed(False)
+
+    def _add_action(self, text, slot):
+        action = QAction(text, self.menu)
+        action.triggered.connect(lambda checked=False: slot())
+        self.menu.addAction(action)
+
+    def on_activated(self, reason):
+        if reason == QSystemTrayIcon.Trigger:
+            self.window.toggle_window()
+
+    def hide(self):
+        self.icon.hide()
@@ -4,8 +4,7 @@ import base64
 import datetime
 import traceback
 
-from PIL import Image
-import numpy as np
+# PIL / numpy 는 쓰는 함수 안에서 import (앱 시작 시간 단축)
 
 
 # ----------------------------------------------------------
@@ -74,6 +73,7 @@ def image_to_base64(pil_img):
 def base64_to_image(b64):
     try:
         import io
+        from PIL import Image
         raw = base64.b64decode(b64)
         return Image.open(io.BytesIO(raw)).convert("RGB")
     except Exception as e:
@@ -87,6 +87,7 @@ def base64_to_image(b64):
 # ----------------------------------------------------------
 def pil_to_np(pil_img):
     try:
+        import numpy as np
         return np.array(pil_img)
     except Exception as e:
         log(f"[pil_to_np] ERROR: {e}")
@@ -98,6 +99,7 @@ def pil_to_np(pil_img):
 # ----------------------------------------------------------
 def np_to_pil(np_img):
     try:
+        from PIL import Image
         return Image.fromarray(np_img)
     except Exception as e:
         log(f"[np_to_pil] ERROR: {e}")